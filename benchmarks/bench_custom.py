@@ -0,0 +1,51 @@
+import warnings
+
+import numpy as np
+import numba
+
+from see_me_rolling.rolling import _apply_custom_rolling
+
+from .common import make_events, value_columns
+
+
+@numba.njit
+def _jit_mean(window):
+    return np.array([np.nanmean(window[:, j]) for j in range(window.shape[1])])
+
+# the same reducer (columnwise mean) in the form each engine expects
+REDUCERS = {
+    'numpy': lambda window: np.nanmean(window, axis = 0),
+    'pandas': lambda window: window.mean().to_frame().T,
+    'numba': _jit_mean,
+    'online': 'mean',
+    'vectorized': lambda windows: np.nanmean(windows, axis = 1),
+}
+
+class CustomRolling:
+    '''
+    _apply_custom_rolling with each engine, over fixed and time windows.
+    sizes are small, since the numpy and pandas engines call the reducer once per window.
+    min_periods = 1, so that every engine gets the same (non empty) windows
+    '''
+    params = (list(REDUCERS), [2_000, 20_000], [30, '30D'])
+    param_names = ['engine', 'n_rows', 'window']
+    timeout = 600
+
+    def setup(self, engine, n_rows, window):
+        warnings.simplefilter('ignore')
+        df = make_events(n_rows, 50, 1., n_columns = 2)
+        self.rolling_obj = df.set_index('date').groupby('group').rolling(window, min_periods = 1)[value_columns(df)]
+        # numba kernels are compiled outside of timings
+        _apply_custom_rolling(
+            df.head(100).set_index('date').groupby('group').rolling(window, min_periods = 1)[value_columns(df)],
+            REDUCERS[engine], engine = engine
+        )
+
+    def _run(self, engine):
+        _apply_custom_rolling(self.rolling_obj, REDUCERS[engine], engine = engine)
+
+    def time_custom_rolling(self, engine, n_rows, window):
+        self._run(engine)
+
+    def peakmem_custom_rolling(self, engine, n_rows, window):
+        self._run(engine)
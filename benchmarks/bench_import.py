@@ -0,0 +1,29 @@
+import sys
+import subprocess
+
+
+_DEFERRED = ('numba', 'dask', 'tqdm') # pyarrow is left out, pandas imports it when installed
+
+
+class Import:
+    '''
+    cold import of see_me_rolling modules, each in a fresh interpreter (timeraw benchmarks).
+    heavy optional backends (numba, dask, tqdm) are imported only when an engine needs them. pyarrow is lazy too,
+    but isn't tracked, since pandas imports it by itself when it is installed
+    '''
+    params = ['rolling', 'streaming', 'lookup', 'online']
+    param_names = ['module']
+    timeout = 120
+
+    def timeraw_import(self, module):
+        return f'import see_me_rolling.{module}'
+
+    def track_deferred_imports(self, module):
+        # number of heavy backends imported by the module itself, should stay 0
+        code = (
+            f'import sys; import see_me_rolling.{module}; '
+            f'print(sum(name in sys.modules for name in {_DEFERRED!r}))'
+        )
+        return int(subprocess.check_output([sys.executable, '-c', code]))
+
+    track_deferred_imports.unit = 'modules'
@@ -0,0 +1,54 @@
+import warnings
+
+from see_me_rolling.rolling import make_generic_resampling_and_shift_features, create_rolling_resampled_features
+
+from .common import make_events, value_columns
+
+
+class Resampling:
+    '''
+    make_generic_resampling_and_shift_features, with and without a dense period grid
+    '''
+    params = ([100_000, 1_000_000], ['D', 'W', 'm'], ['last', 'mean'], [False, True])
+    param_names = ['n_rows', 'freq', 'agg', 'assert_frequency']
+    timeout = 300
+
+    def setup(self, n_rows, freq, agg, assert_frequency):
+        warnings.simplefilter('ignore')
+        self.df = make_events(n_rows, 1_000, 1., n_columns = 4)
+
+    def _run(self, freq, agg, assert_frequency):
+        make_generic_resampling_and_shift_features(
+            self.df, value_columns(self.df), ['group'], 'date', freq = freq, agg = agg,
+            n_periods_shift = 1, assert_frequency = assert_frequency
+        )
+
+    def time_resampling(self, n_rows, freq, agg, assert_frequency):
+        self._run(freq, agg, assert_frequency)
+
+    def peakmem_resampling(self, n_rows, freq, agg, assert_frequency):
+        self._run(freq, agg, assert_frequency)
+
+class RollingResampled:
+    '''
+    create_rolling_resampled_features, rolling then resampling and the other way around
+    '''
+    params = ([100_000, 1_000_000], [True, False], ['7D', '60D'])
+    param_names = ['n_rows', 'rolling_first', 'window']
+    timeout = 300
+
+    def setup(self, n_rows, rolling_first, window):
+        warnings.simplefilter('ignore')
+        self.df = make_events(n_rows, 1_000, 1., n_columns = 2)
+
+    def _run(self, rolling_first, window):
+        create_rolling_resampled_features(
+            self.df, value_columns(self.df), ['group'], 'date', rolling_first = rolling_first,
+            window = window, resample_freq = 'W'
+        )
+
+    def time_rolling_resampled(self, n_rows, rolling_first, window):
+        self._run(rolling_first, window)
+
+    def peakmem_rolling_resampled(self, n_rows, rolling_first, window):
+        self._run(rolling_first, window)
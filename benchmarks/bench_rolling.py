@@ -0,0 +1,108 @@
+import warnings
+
+from dask import dataframe as dd
+
+from see_me_rolling.rolling import (
+    make_generic_rolling_features, make_hierarchical_rolling_features, make_multi_rolling_features
+)
+
+from .common import make_events, value_columns
+
+
+class RollingScaling:
+    '''
+    make_generic_rolling_features over growing data, with more and more skewed groups
+    '''
+    params = ([10_000, 100_000, 1_000_000], [10, 1_000], [0., 1.5], ['pandas', 'native'])
+    param_names = ['n_rows', 'n_groups', 'skew', 'backend']
+    timeout = 300
+
+    def setup(self, n_rows, n_groups, skew, backend):
+        warnings.simplefilter('ignore')
+        self.df = make_events(n_rows, n_groups, skew)
+        # numba kernels are compiled outside of timings
+        make_generic_rolling_features(self.df.head(100), ['x0'], ['group'], 'date', window = '7D', backend = backend)
+
+    def _run(self, backend):
+        make_generic_rolling_features(self.df, ['x0'], ['group'], 'date', window = '7D', backend = backend)
+
+    def time_rolling(self, n_rows, n_groups, skew, backend):
+        self._run(backend)
+
+    def peakmem_rolling(self, n_rows, n_groups, skew, backend):
+        self._run(backend)
+
+class RollingShape:
+    '''
+    make_generic_rolling_features with longer windows, more columns and other operations
+    '''
+    params = (['7D', '90D', 100], [1, 8], ['mean', 'std', 'max'])
+    param_names = ['window', 'n_columns', 'rolling_operation']
+    timeout = 300
+
+    def setup(self, window, n_columns, rolling_operation):
+        warnings.simplefilter('ignore')
+        self.df = make_events(200_000, 1_000, 1., n_columns)
+
+    def _run(self, window, rolling_operation):
+        make_generic_rolling_features(
+            self.df, value_columns(self.df), ['group'], 'date', window = window, rolling_operation = rolling_operation
+        )
+
+    def time_rolling(self, window, n_columns, rolling_operation):
+        self._run(window, rolling_operation)
+
+    def peakmem_rolling(self, window, n_columns, rolling_operation):
+        self._run(window, rolling_operation)
+
+class RollingDask:
+    '''
+    make_generic_rolling_features over dask DataFrames (shuffled by group, rolled by partition), computed
+    '''
+    params = ([100_000, 1_000_000], [1, 4])
+    param_names = ['n_rows', 'npartitions']
+    timeout = 600
+
+    def setup(self, n_rows, npartitions):
+        warnings.simplefilter('ignore')
+        self.df = dd.from_pandas(make_events(n_rows, 1_000, 1.), npartitions = npartitions)
+
+    def _run(self):
+        make_generic_rolling_features(self.df, ['x0'], ['group'], 'date', window = '7D').compute(scheduler = 'sync')
+
+    def time_rolling(self, n_rows, npartitions):
+        self._run()
+
+    def peakmem_rolling(self, n_rows, npartitions):
+        self._run()
+
+class RollingHierarchical:
+    '''
+    rolling features of nested groupings (group, group//10, group//100): make_hierarchical_rolling_features,
+    sorting once, against one make_multi_rolling_features call per grouping
+    '''
+    params = ([100_000, 1_000_000], ['one_pass', 'per_level'])
+    param_names = ['n_rows', 'mode']
+    timeout = 600
+
+    def setup(self, n_rows, mode):
+        warnings.simplefilter('ignore')
+        self.df = make_events(n_rows, 1_000, 1.)
+        self.df['group_10'] = self.df['group']//10
+        self.df['group_100'] = self.df['group']//100
+        self.levels = [['group'], ['group_10'], ['group_100']]
+        self.spec = {'7D': ['mean', 'sum'], '30D': ['max']}
+        self._run(mode) # numba kernels are compiled outside of timings
+
+    def _run(self, mode):
+        if mode == 'one_pass':
+            make_hierarchical_rolling_features(self.df, ['x0'], self.levels, 'date', self.spec)
+        else:
+            for level in self.levels:
+                make_multi_rolling_features(self.df, ['x0'], level, 'date', self.spec)
+
+    def time_rolling(self, n_rows, mode):
+        self._run(mode)
+
+    def peakmem_rolling(self, n_rows, mode):
+        self._run(mode)
@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+
+
+def make_events(n_rows, n_groups = 100, skew = 0., n_columns = 1, days = 365, seed = 0):
+    '''
+    synthetic event log with columns group, date and x0...x{n_columns - 1} (normal floats).
+    rows are spread over n_groups groups with zipf like sizes: group k gets rows with probability proportional
+    to (k + 1)**-skew, so skew = 0 gives groups of the same expected size and larger skews a few huge groups.
+    dates are uniform over days, and rows are sorted by date (as event logs usually are)
+    '''
+    rng = np.random.default_rng(seed)
+    weights = (np.arange(n_groups) + 1.)**-skew
+    df = pd.DataFrame({
+        'group': rng.choice(n_groups, size = n_rows, p = weights/weights.sum()),
+        'date': pd.Timestamp('2020-01-01') + pd.to_timedelta(np.sort(rng.integers(0, days*24*3600, n_rows)), 's'),
+    })
+    for i in range(n_columns):
+        df[f'x{i}'] = rng.normal(size = n_rows)
+
+    return df
+
+def value_columns(df):
+    return [col for col in df.columns if col.startswith('x')]
@@ -2,11 +2,41 @@
 
 __all__ = ["index", "modules", "custom_doc_links", "git_url"]
 
-index = {"make_generic_rolling_features": "rolling.ipynb",
+index = {"fingerprint": "cache.ipynb",
+         "FeatureCache": "cache.ipynb",
+         "add_stage_hook": "diagnostics.ipynb",
+         "remove_stage_hook": "diagnostics.ipynb",
+         "profile": "diagnostics.ipynb",
+         "ProgressReporter": "diagnostics.ipynb",
+         "TqdmProgress": "diagnostics.ipynb",
+         "LoggingProgress": "diagnostics.ipynb",
+         "set_progress": "diagnostics.ipynb",
+         "dask_progress": "diagnostics.ipynb",
+         "lazy_import": "lazy.ipynb",
+         "lazy_njit": "lazy.ipynb",
+         "PointInTimeIndex": "lookup.ipynb",
+         "make_point_in_time_features": "lookup.ipynb",
+         "OnlineRollingFeatures": "online.ipynb",
+         "AsyncRollingFeatures": "online.ipynb",
+         "make_generic_rolling_features": "rolling.ipynb",
          "make_generic_resampling_and_shift_features": "rolling.ipynb",
-         "create_rolling_resampled_features": "rolling.ipynb"}
+         "create_rolling_resampled_features": "rolling.ipynb",
+         "make_multi_rolling_features": "rolling.ipynb",
+         "make_hierarchical_rolling_features": "rolling.ipynb",
+         "iter_rolling_features": "streaming.ipynb",
+         "make_streaming_rolling_features": "streaming.ipynb",
+         "read_arrow": "streaming.ipynb",
+         "make_arrow_rolling_features": "streaming.ipynb",
+         "update_rolling_features": "streaming.ipynb",
+         "update_resampling_and_shift_features": "streaming.ipynb"}
 
-modules = ["rolling.py"]
+modules = ["cache.py",
+           "diagnostics.py",
+           "lazy.py",
+           "lookup.py",
+           "online.py",
+           "rolling.py",
+           "streaming.py"]
 
 doc_url = "https://AlanGanem.github.io/see_me_rolling/"
 
@@ -0,0 +1,206 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: notebooks_dev/cache.ipynb (unless otherwise specified).
+
+__all__ = ['fingerprint', 'FeatureCache']
+
+# Cell
+import os
+import json
+import hashlib
+import uuid
+import inspect
+from functools import lru_cache
+
+import pandas as pd
+import numpy as np
+
+from . import __version__
+from .lazy import lazy_import
+
+_pa = lazy_import('pyarrow')
+
+
+# Cell
+def _hash_column(hasher, name, series):
+    '''
+    feeds the name, dtype and values of a column to hasher.
+    plain numpy columns are hashed straight from their buffers, others through pandas' row hashes
+    '''
+    hasher.update(repr((name, str(series.dtype))).encode())
+    values = series.values
+    if isinstance(values, np.ndarray) and values.dtype.kind in 'biufcmM':
+        hasher.update(np.ascontiguousarray(values).view(np.uint8))
+    else:
+        hasher.update(pd.util.hash_pandas_object(series, index = False).values.view(np.uint8))
+
+def _param_repr(value):
+    '''
+    stable representation of parameter values json can't serialize
+    '''
+    if isinstance(value, (set, frozenset)):
+        return sorted(repr(i) for i in value)
+    if callable(value):
+        # decorated functions are fingerprinted by the code of the function they wrap
+        code = getattr(inspect.unwrap(value), '__code__', None)
+        if code is not None:
+            consts = tuple(c for c in code.co_consts if not hasattr(c, 'co_code'))
+            code = hashlib.blake2b(code.co_code + repr((code.co_names, consts)).encode(), digest_size = 8).hexdigest()
+        return [getattr(value, '__module__', None), getattr(value, '__qualname__', repr(value)), code]
+    return repr(value)
+
+def fingerprint(df, columns = None, **params):
+    '''
+    fast content fingerprint of df[columns] (defaults to all columns) and a set of parameters.
+    the index is not part of the fingerprint
+
+    Parameters
+    ----------
+
+    df: DataFrame
+        DataFrame whose columns are fingerprinted
+
+    columns: list of str
+        columns to fingerprint, in order
+
+    params:
+        parameters of the computation, fingerprinted by value (callables by name and bytecode)
+
+    Returns
+    -------
+    hex str
+    '''
+    hasher = hashlib.blake2b(digest_size = 20)
+    for col in (df.columns if columns is None else columns):
+        _hash_column(hasher, col, df[col])
+
+    hasher.update(json.dumps(params, sort_keys = True, default = _param_repr).encode())
+    return hasher.hexdigest()
+
+
+# Cell
+@lru_cache(maxsize = None)
+def _package_fingerprint():
+    '''
+    hash of the version and source files of see_me_rolling, computed once per process.
+    part of every cache key, since cached functions call into see_me_rolling code that their own bytecode doesn't cover
+    '''
+    hasher = hashlib.blake2b(__version__.encode(), digest_size = 8)
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.py'):
+            with open(os.path.join(directory, name), 'rb') as f:
+                hasher.update(name.encode())
+                hasher.update(f.read())
+    return hasher.hexdigest()
+
+class FeatureCache:
+    '''
+    disk-backed memoization of feature DataFrames.
+    entries are uncompressed Arrow IPC files in directory, named by their key, and are returned memory-mapped,
+    so a hit costs no more than opening a file. when the directory grows beyond max_size bytes,
+    least recently used entries (by file modification time, refreshed on every hit) are evicted.
+
+    Parameters
+    ----------
+
+    directory: str
+        path of the cache directory, created if missing
+
+    max_size: int, default = 10GB
+        maximum size of the cache directory, in bytes
+    '''
+
+    SUFFIX = '.arrow'
+
+    def __init__(self, directory, max_size = 10*2**30):
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok = True)
+
+    def key(self, df, columns = None, **params):
+        '''
+        fingerprint of df[columns], params and the see_me_rolling source (version and files), so entries computed by
+        other versions of the package are never returned. see fingerprint
+        '''
+        return fingerprint(df, columns, **params, _package = _package_fingerprint())
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.SUFFIX):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return sorted(entries)
+
+    def size(self):
+        '''
+        total size of cached entries, in bytes
+        '''
+        return sum(size for _, size, _ in self._entries())
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key):
+        '''
+        memory-mapped DataFrame stored under key, or None on a miss
+        '''
+        path = self._path(key)
+        try:
+            table = _pa.ipc.open_file(_pa.memory_map(path)).read_all()
+        except FileNotFoundError:
+            return None
+
+        os.utime(path) # mark as recently used
+        return table.to_pandas(split_blocks = True)
+
+    def put(self, key, df):
+        '''
+        stores df under key, then evicts least recently used entries until the cache fits in max_size
+        '''
+        path = self._path(key)
+        table = _pa.Table.from_pandas(df)
+        tmp_path = os.path.join(self.directory, f'.{uuid.uuid4().hex}.tmp')
+        with _pa.OSFile(tmp_path, 'wb') as sink:
+            with _pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        # atomic, so concurrent readers never see partial files
+        os.replace(tmp_path, path)
+        self._evict(keep = path)
+
+    def _evict(self, keep = None):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        '''
+        removes all cached entries
+        '''
+        for _, _, path in self._entries():
+            os.remove(path)
+
+    def cached(self, func, df, columns = None, **params):
+        '''
+        func(df, **params), computed only when the fingerprint of df[columns] and params is not cached.
+        func is fingerprinted by its own bytecode, and see_me_rolling code it calls by the package source (see key).
+        changes to other code func calls are not detected, clear the cache after them
+        '''
+        key = self.key(df, columns, func = func, **params)
+        result = self.get(key)
+        if result is None:
+            result = func(df, **params)
+            self.put(key, result)
+
+        return result
@@ -0,0 +1,427 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: notebooks_dev/diagnostics.ipynb (unless otherwise specified).
+
+__all__ = ['add_stage_hook', 'remove_stage_hook', 'profile', 'ProgressReporter', 'TqdmProgress', 'LoggingProgress',
+           'set_progress', 'dask_progress']
+
+# Cell
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from warnings import warn
+from abc import ABC, abstractmethod
+from functools import wraps
+
+import pandas as pd
+
+
+# Cell
+_stage_hooks = [] # callbacks of finished stages. stages are only measured while there is at least one
+_local = threading.local()
+
+def add_stage_hook(hook):
+    '''
+    registers hook, called with the record (dict) of every finished stage of see_me_rolling functions.
+    records have name, start (time.perf_counter seconds), duration (seconds), rows_in, rows_out, memory_delta
+    (resident memory difference, in bytes), depth (nesting level), thread, pid and args (stage parameters).
+    rows are None for inputs and outputs that are not pandas objects (e.g. lazy dask DataFrames), and memory_delta
+    is None where resident memory can't be read (it is read from /proc/self/statm)
+    '''
+    _stage_hooks.append(hook)
+
+def remove_stage_hook(hook):
+    '''
+    unregisters a hook added with add_stage_hook
+    '''
+    _stage_hooks.remove(hook)
+
+def _n_rows(obj):
+    '''
+    number of rows of pandas objects (of the grouped frame, for GroupBys), None for others
+    '''
+    obj = getattr(obj, 'obj', obj) if isinstance(obj, pd.core.groupby.GroupBy) else obj
+    return len(obj) if isinstance(obj, (pd.DataFrame, pd.Series)) else None
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else None
+
+def _resident_memory():
+    '''
+    resident memory of the process in bytes, None if unavailable
+    '''
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1])*_PAGE_SIZE
+    except (OSError, TypeError, ValueError, IndexError):
+        return None
+
+class _NullStage:
+    '''
+    stage returned while no hook is registered. does nothing
+    '''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def output(self, obj):
+        return obj
+
+_NULL_STAGE = _NullStage()
+
+class _Stage:
+    '''
+    measures wall time, rows in/out and resident memory delta of a block, and passes its record to the stage hooks
+    '''
+
+    def __init__(self, name, obj_in, args):
+        self.record = {'name': name, 'rows_in': _n_rows(obj_in), 'rows_out': None, 'args': args}
+
+    def output(self, obj):
+        '''
+        records the number of rows of obj, the output of the stage, and returns it
+        '''
+        self.record['rows_out'] = _n_rows(obj)
+        return obj
+
+    def __enter__(self):
+        self.depth = getattr(_local, 'depth', 0)
+        _local.depth = self.depth + 1
+        self.memory = _resident_memory()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter() - self.start
+        memory = _resident_memory()
+        _local.depth = self.depth
+        self.record.update(
+            start = self.start,
+            duration = duration,
+            memory_delta = None if memory is None or self.memory is None else memory - self.memory,
+            depth = self.depth,
+            thread = threading.get_ident(),
+            pid = os.getpid(),
+        )
+        for hook in list(_stage_hooks):
+            hook(self.record)
+        return False
+
+def _stage(name, obj_in = None, **args):
+    '''
+    context manager measuring an internal stage named name, with input obj_in. stage.output(obj) records the output rows.
+    while no hook is registered it is a shared no-op object, so instrumentation costs a function call per stage
+    '''
+    if not _stage_hooks:
+        return _NULL_STAGE
+
+    return _Stage(name, obj_in, args)
+
+def _profiled(func):
+    '''
+    decorator measuring every call of a public function as a stage named after it, with its first argument as input
+    '''
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _stage_hooks:
+            return func(*args, **kwargs)
+
+        with _Stage(func.__name__, args[0] if args else None, {}) as stage:
+            return stage.output(func(*args, **kwargs))
+
+    return wrapper
+
+
+# Cell
+class profile:
+    '''
+    context manager recording every stage (see add_stage_hook) of see_me_rolling functions called inside it,
+    e.g. set_index, groupby, rolling, reset_index, column renaming and resampling, nested under the public function
+    that ran them. outside of it (or of any other hook), instrumentation does nothing.
+    stages run in other processes (n_jobs) or by dask workers are not recorded
+
+    Attributes
+    ----------
+
+    records: list of dict
+        records of finished stages, in the order they finished (please refer to add_stage_hook)
+    '''
+
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+
+    def _hook(self, record):
+        with self._lock:
+            self.records.append(record)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        add_stage_hook(self._hook)
+        return self
+
+    def __exit__(self, *exc_info):
+        remove_stage_hook(self._hook)
+        return False
+
+    def to_dict(self):
+        '''
+        structured export: {"stages": records, in start order, with start relative to the beginning of the profile}
+        '''
+        return {
+            'stages': [
+                {**record, 'start': record['start'] - self._start}
+                for record in sorted(self.records, key = lambda record: record['start'])
+            ]
+        }
+
+    def to_frame(self):
+        '''
+        records as a DataFrame, one row per stage in start order
+        '''
+        return pd.DataFrame(self.to_dict()['stages'])
+
+    def to_chrome_trace(self, path = None):
+        '''
+        records in Chrome trace event format (complete events, timestamps in microseconds), viewable in
+        chrome://tracing or Perfetto. written as json to path, if passed
+
+        Returns
+        -------
+        dict
+        '''
+        trace = {
+            'traceEvents': [
+                {
+                    'name': record['name'],
+                    'cat': 'see_me_rolling',
+                    'ph': 'X',
+                    'ts': (record['start'] - self._start)*1e6,
+                    'dur': record['duration']*1e6,
+                    'pid': record['pid'],
+                    'tid': record['thread'],
+                    'args': {
+                        'rows_in': record['rows_in'],
+                        'rows_out': record['rows_out'],
+                        'memory_delta': record['memory_delta'],
+                        **{k: str(v) for k, v in record['args'].items()},
+                    },
+                }
+                for record in self.to_dict()['stages']
+            ],
+            'displayTimeUnit': 'ms',
+        }
+        if path is not None:
+            with open(path, 'w') as f:
+                json.dump(trace, f)
+
+        return trace
+
+
+# Cell
+class ProgressReporter(ABC):
+    '''
+    base class of progress reporters of long loops (custom function windows, process pool shards, dask tasks).
+    loops run in chunks of every iterations and report after a chunk only if interval seconds passed since the
+    last report, so reporting costs nothing per iteration. subclasses must implement report (and may override start and finish)
+
+    Parameters
+    ----------
+
+    every: int, default = 10000
+        number of iterations between checks of the clock
+
+    interval: float, default = 1.
+        minimum number of seconds between two reports of the same loop
+    '''
+
+    def __init__(self, every = 10000, interval = 1.):
+        self.every = every
+        self.interval = interval
+
+    def start(self, name, total):
+        '''
+        called once, before loop name (of total iterations) starts
+        '''
+
+    @abstractmethod
+    def report(self, name, done, total, elapsed):
+        '''
+        called with the number of iterations done and seconds elapsed since the loop started
+        '''
+
+    def finish(self, name, done, total, elapsed):
+        '''
+        called once, after the loop ends (or fails). reports the final count by default
+        '''
+        self.report(name, done, total, elapsed)
+
+class TqdmProgress(ProgressReporter):
+    '''
+    reports progress as tqdm bars, one per loop. tqdm_kwargs are passed to tqdm
+    '''
+
+    def __init__(self, every = 10000, interval = .1, **tqdm_kwargs):
+        super().__init__(every = every, interval = interval)
+        self.tqdm_kwargs = tqdm_kwargs
+        self._bars = {}
+
+    def start(self, name, total):
+        from tqdm import tqdm
+        self._bars[name] = tqdm(total = total, desc = name, **self.tqdm_kwargs)
+
+    def report(self, name, done, total, elapsed):
+        bar = self._bars[name]
+        bar.update(done - bar.n)
+
+    def finish(self, name, done, total, elapsed):
+        self.report(name, done, total, elapsed)
+        self._bars.pop(name).close()
+
+class LoggingProgress(ProgressReporter):
+    '''
+    reports progress as log records of logger (defaults to the "see_me_rolling" logger), at level
+    '''
+
+    def __init__(self, every = 10000, interval = 10., logger = None, level = logging.INFO):
+        super().__init__(every = every, interval = interval)
+        self.logger = logging.getLogger('see_me_rolling') if logger is None else logger
+        self.level = level
+
+    def report(self, name, done, total, elapsed):
+        self.logger.log(self.level, '%s: %d/%d (%.0f%%) in %.1fs', name, done, total, 100*done/max(total, 1), elapsed)
+
+_reporter = 'auto'
+
+def set_progress(reporter):
+    '''
+    sets the progress reporter of see_me_rolling loops, returning the previous one.
+    reporter is a ProgressReporter, None (silent) or "auto" (the default), which shows tqdm bars when
+    stderr is a terminal and is silent otherwise (batch workers, pipes, log files)
+    '''
+    global _reporter
+    previous, _reporter = _reporter, reporter
+    return previous
+
+def _get_reporter():
+    if _reporter == 'auto':
+        return TqdmProgress() if sys.stderr is not None and sys.stderr.isatty() else None
+
+    return _reporter
+
+class _NullProgress:
+    '''
+    progress of loops while reporting is off. the whole loop is a single chunk
+    '''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def chunks(self, total):
+        yield range(total)
+
+    def update(self, n = 1):
+        pass
+
+_NULL_PROGRESS = _NullProgress()
+
+class _Progress:
+    '''
+    throttled progress of loop name, of total iterations, reported to reporter
+    '''
+
+    def __init__(self, reporter, name, total):
+        self.reporter = reporter
+        self.name = name
+        self.total = total
+        self.done = 0
+
+    def __enter__(self):
+        self.start = self.last = time.perf_counter()
+        self.reporter.start(self.name, self.total)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.reporter.finish(self.name, self.done, self.total, time.perf_counter() - self.start)
+        return False
+
+    def chunks(self, total):
+        '''
+        ranges of at most reporter.every iterations covering range(total), updating progress after each one
+        '''
+        every = max(1, int(self.reporter.every))
+        for chunk_start in range(0, total, every):
+            chunk_end = min(chunk_start + every, total)
+            yield range(chunk_start, chunk_end)
+            self.update(chunk_end - chunk_start)
+
+    def update(self, n = 1):
+        '''
+        adds n iterations done, reporting them if interval seconds passed since the last report.
+        the last iterations are reported by reporter.finish
+        '''
+        self.done += n
+        now = time.perf_counter()
+        if now - self.last >= self.reporter.interval and self.done < self.total:
+            self.last = now
+            self.reporter.report(self.name, self.done, self.total, now - self.start)
+
+def _progress(name, total):
+    '''
+    context manager tracking the progress of loop name, of total iterations:
+
+        with _progress(name, len(items)) as progress:
+            for chunk in progress.chunks(len(items)):
+                for i in chunk:
+                    ...
+
+    while reporting is off it is a shared no-op object and chunks yields a single range
+    '''
+    reporter = _get_reporter()
+    if reporter is None:
+        return _NULL_PROGRESS
+
+    return _Progress(reporter, name, total)
+
+def dask_progress(name = 'dask'):
+    '''
+    dask callback reporting finished tasks of computations run inside it to the progress reporter (see set_progress),
+    e.g. with dask_progress(): features.compute(). it works with dask's local schedulers (threads, processes).
+    tasks run by a dask.distributed client never reach local callbacks, so a warning is raised while one is active;
+    use distributed.progress for those
+    '''
+    from dask.callbacks import Callback
+
+    distributed = sys.modules.get('distributed') # no client can be active if distributed was never imported
+    if distributed is not None:
+        try:
+            distributed.default_client()
+        except ValueError:
+            pass
+        else:
+            warn(
+                'a dask.distributed client is active: tasks it runs are not reported by dask_progress, '
+                'use distributed.progress instead',
+                stacklevel = 2
+            )
+
+    class _DaskProgress(Callback):
+        _tracker = _NULL_PROGRESS
+
+        def _start_state(self, dsk, state):
+            total = sum(len(state[k]) for k in ('ready', 'waiting', 'running', 'finished'))
+            self._tracker = _progress(name, total).__enter__()
+
+        def _posttask(self, key, result, dsk, state, worker_id):
+            self._tracker.update(1)
+
+        def _finish(self, dsk, state, errored):
+            self._tracker.__exit__(None, None, None)
+
+    return _DaskProgress()
@@ -0,0 +1,118 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: notebooks_dev/lazy.ipynb (unless otherwise specified).
+
+__all__ = ['lazy_import', 'lazy_njit']
+
+# Cell
+import sys
+import types
+import importlib
+import threading
+
+
+# Cell
+class _LazyModule(types.ModuleType):
+    '''
+    placeholder of a module, imported on first attribute access.
+    it is not registered in sys.modules, so "name in sys.modules" keeps telling whether the module was really imported
+    '''
+
+    def _load(self):
+        return importlib.import_module(self.__name__)
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+def lazy_import(name):
+    '''
+    module name if it is already imported, otherwise a placeholder importing it on first attribute access.
+    used for heavy optional backends (numba, pyarrow, dask), so importing see_me_rolling doesn't import them
+    until an engine actually needs them
+
+    Parameters
+    ----------
+
+    name: str
+        absolute name of the module, e.g. "pyarrow.parquet"
+
+    Returns
+    -------
+    module
+    '''
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    return _LazyModule(name)
+
+
+# Cell
+_jit_lock = threading.RLock()
+
+def _materialize(module_globals):
+    '''
+    replaces the lazy kernels of a module by numba dispatchers (numba still compiles each one on its first call),
+    and lazy kernels and modules they refer to by the real ones, so numba sees dispatchers and modules
+    (e.g. numba.prange) when typing them. all kernels of the module are replaced at once, so every global lookup
+    returns a dispatcher afterwards, e.g. when kernels are passed as arguments to other kernels
+    '''
+    numba = importlib.import_module('numba')
+    kernels = [
+        value for value in list(module_globals.values())
+        if isinstance(value, _LazyDispatcher) and value.py_func.__globals__ is module_globals
+    ]
+    for kernel in kernels:
+        if kernel.dispatcher is None:
+            kernel.dispatcher = numba.njit(**kernel.options)(kernel.py_func)
+
+    names = {name for kernel in kernels for name in kernel.py_func.__code__.co_names}
+    for name, value in list(module_globals.items()):
+        if isinstance(value, _LazyDispatcher):
+            module_globals[name] = value.compile() # kernels imported from other modules are replaced too
+        elif isinstance(value, _LazyModule) and name in names:
+            module_globals[name] = value._load()
+
+class _LazyDispatcher:
+    '''
+    numba.njit(**options)(func), created (importing numba) on the first call of a lazy kernel of its module
+    (see _materialize). lazy kernels passed as arguments are compiled before the call
+    '''
+
+    def __init__(self, func, options):
+        self.py_func = func
+        self.options = options
+        self.dispatcher = None
+        self.__name__ = func.__name__
+        self.__qualname__ = func.__qualname__
+        self.__module__ = func.__module__
+        self.__doc__ = func.__doc__
+        self.__wrapped__ = func
+
+    def compile(self):
+        '''
+        numba dispatcher of py_func
+        '''
+        with _jit_lock:
+            if self.dispatcher is None:
+                _materialize(self.py_func.__globals__)
+
+        return self.dispatcher
+
+    def __call__(self, *args, **kwargs):
+        if any(isinstance(arg, _LazyDispatcher) for arg in args):
+            # kernels passed as arguments (first class functions) must be dispatchers too
+            args = [arg.compile() if isinstance(arg, _LazyDispatcher) else arg for arg in args]
+
+        return (self.dispatcher or self.compile())(*args, **kwargs)
+
+def lazy_njit(**options):
+    '''
+    decorator equivalent to numba.njit(**options) for module level kernels, deferring the import of numba
+    (and compilation, which numba.njit without signatures already defers) to the first call
+    '''
+    def decorator(func):
+        return _LazyDispatcher(func, options)
+
+    return decorator
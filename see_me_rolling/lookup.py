@@ -0,0 +1,368 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: notebooks_dev/lookup.ipynb (unless otherwise specified).
+
+__all__ = ['PointInTimeIndex', 'make_point_in_time_features']
+
+# Cell
+import os
+import json
+from functools import partial
+
+import pandas as pd
+import numpy as np
+
+from .rolling import (
+    _get_group_codes, _get_sorted_order, _get_group_starts, _grouped_searchsorted,
+    _as_int64, _window_to_int64, _default_min_periods, _multi_rolling_feature_name
+)
+from .streaming import _group_keys, read_arrow
+from .lazy import lazy_import, lazy_njit
+
+_numba = lazy_import('numba')
+_pa = lazy_import('pyarrow')
+
+
+# Cell
+@lazy_njit(parallel = True, nogil = True)
+def _grouped_kahan_cumsum(values, group_starts, group_ends):
+    '''
+    cumulative sums of the columns of values restarting at each group, with Kahan (compensated) summation,
+    so the rounding error of prefix sums doesn't grow with the length of the groups
+    '''
+    out = np.empty(values.shape)
+    for g in _numba.prange(len(group_starts)):
+        for j in range(values.shape[1]):
+            total = 0.
+            compensation = 0.
+            for i in range(group_starts[g], group_ends[g]):
+                y = values[i, j] - compensation
+                t = total + y
+                compensation = (t - total) - y
+                total = t
+                out[i, j] = total
+    return out
+
+_ADDITIVE_OPERATIONS = ('sum', 'mean', 'count', 'var', 'std')
+_LOOKUP_OPERATIONS = (*_ADDITIVE_OPERATIONS, 'min', 'max', 'median', 'quantile')
+
+def _window_sum(prefix, start, end, lo):
+    '''
+    sums of rows start:end from a prefix sum array, for windows inside groups beginning at lo
+    '''
+    return (
+        np.where((end > lo)[:, None], prefix[end], 0.) -
+        np.where((start > lo)[:, None], prefix[start], 0.)
+    )
+
+def _window_moments(prefix, start, end, lo):
+    '''
+    number of valid observations, and sums of centered values and squares, of rows start:end
+    '''
+    return tuple(_window_sum(prefix[name], start, end, lo) for name in ('count', 'sum', 'sumsq'))
+
+def _aggregate_windows(rolling_operation, values, moments, shift, start, end, ddof = 1, quantile = None):
+    '''
+    rolling_operation over rows start:end of values, and the number of valid observations of each window.
+    additive operations come from the window moments (see _window_moments) of values centered by shift,
+    the others reduce the rows of each window (see _reduce_windows)
+    '''
+    nobs, centered_sum, centered_sumsq = moments
+
+    if rolling_operation in _ADDITIVE_OPERATIONS:
+        if rolling_operation == 'count':
+            return nobs, nobs
+
+        if rolling_operation == 'sum':
+            return centered_sum + nobs*shift, nobs
+
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            if rolling_operation == 'mean':
+                return centered_sum/nobs + shift, nobs
+
+            m2 = centered_sumsq - centered_sum**2/nobs
+            var = np.maximum(m2, 0.)/(nobs - ddof)
+        var[nobs - ddof <= 0] = np.nan
+        return (var if rolling_operation == 'var' else np.sqrt(var)), nobs
+
+    if rolling_operation == 'median':
+        quantile = 0.5
+    operation = ('min', 'max').index(rolling_operation) if rolling_operation in ('min', 'max') else 2
+
+    result = np.full((len(start), values.shape[1]), np.nan)
+    _reduce_windows(np.asarray(values), start, end, operation, np.nan if quantile is None else quantile, result)
+    return result, nobs
+
+@lazy_njit(nogil = True)
+def _reduce_windows(values, start, end, operation, quantile, out):
+    '''
+    min (operation 0), max (1) or quantile (2, linear interpolation) of each column of rows start:end of values,
+    ignoring NaNs. only the rows of each window are read, and empty windows are skipped
+    '''
+    for i in range(len(start)):
+        if end[i] <= start[i]:
+            continue
+        for j in range(values.shape[1]):
+            window = values[start[i]:end[i], j]
+            if operation == 0:
+                out[i, j] = np.nanmin(window)
+            elif operation == 1:
+                out[i, j] = np.nanmax(window)
+            else:
+                out[i, j] = np.nanquantile(window, quantile)
+
+class PointInTimeIndex:
+    '''
+    per group sorted index of a history DataFrame, to compute rolling features only at query points (as-of lookups).
+    history is sorted by group and date once. each query finds its group by key and its window bounds by binary search
+    inside the group; additive aggregates (sum, mean, count, var, std) come from prefix sums in O(1) per query, and the
+    others (min, max, median, quantile) reduce only the rows of the queried windows.
+    cost grows with the number of queries, not with history size, and any window length can be queried from the same
+    index (e.g. sweeping windows from 7D to 365D).
+    the index can be saved with save and memory-mapped back with PointInTimeIndex.load
+
+    Parameters
+    ----------
+
+    history: DataFrame
+        DataFrame with past observations
+
+    calculate_columns: list of str
+        list of columns to compute features of
+
+    group_columns: list of str
+        list of columns identifying each group (e.g. customer)
+
+    date_column: str
+        datetime column of history
+    '''
+
+    def __init__(self, history, calculate_columns, group_columns, date_column):
+        self.calculate_columns = list(calculate_columns)
+        self.group_columns = list(group_columns)
+        self.date_column = date_column
+
+        codes = _get_group_codes(history, self.group_columns)
+        order = _get_sorted_order(codes, history[date_column].values)
+        self.group_starts = _get_group_starts(codes[order])
+        self.group_ends = np.append(self.group_starts[1:], len(order)).astype(np.int64)
+        self.keys = _group_keys(history[self.group_columns].iloc[order[self.group_starts]], self.group_columns)
+        self.dates = _as_int64(history[date_column].values[order])
+        self.values = history[self.calculate_columns].values[order].astype(np.float64)
+        self._prefix = None
+
+    def _prefix_sums(self):
+        '''
+        per group prefix sums of valid observations, and of values and squares centered by their group mean
+        (centering keeps var accurate when the mean is large compared to the spread), accumulated with Kahan summation.
+        prefix[k] holds the sum of rows before k inside the group of row k - 1, with a leading row of zeros
+        '''
+        if self._prefix is None:
+            valid = ~np.isnan(self.values)
+            values = np.where(valid, self.values, 0.)
+            group_sizes = self.group_ends - self.group_starts
+            group_of_row = np.repeat(np.arange(len(group_sizes)), group_sizes)
+            cumsum = partial(_grouped_kahan_cumsum, group_starts = self.group_starts, group_ends = self.group_ends)
+
+            counts = cumsum(valid.astype(np.float64))
+            group_counts = counts[self.group_ends - 1]
+            group_sums = cumsum(values)[self.group_ends - 1]
+            with np.errstate(invalid = 'ignore', divide = 'ignore'):
+                means = np.where(group_counts > 0, group_sums/group_counts, 0.)
+
+            centered = np.where(valid, values - means[group_of_row], 0.)
+            zeros = np.zeros((1, valid.shape[1]))
+            self._prefix = {
+                'count': np.concatenate([zeros, counts]),
+                'sum': np.concatenate([zeros, cumsum(centered)]),
+                'sumsq': np.concatenate([zeros, cumsum(centered**2)]),
+                'mean': np.concatenate([means, zeros]), # last row for queries of unknown groups
+            }
+
+        return self._prefix
+
+    _ARRAYS = ('group_starts', 'group_ends', 'dates', 'values')
+
+    def save(self, path):
+        '''
+        saves the index, with its prefix sums, to directory path: one .npy file per array, group keys
+        as an Arrow IPC file and the column names as json
+        '''
+        os.makedirs(path, exist_ok = True)
+        for name in self._ARRAYS:
+            np.save(os.path.join(path, f'{name}.npy'), getattr(self, name))
+        for name, array in self._prefix_sums().items():
+            np.save(os.path.join(path, f'prefix_{name}.npy'), array)
+
+        keys = self.keys.to_frame(index = False)
+        table = _pa.Table.from_pandas(keys, preserve_index = False)
+        with _pa.OSFile(os.path.join(path, 'keys.arrow'), 'wb') as sink:
+            with _pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({
+                'calculate_columns': self.calculate_columns,
+                'group_columns': self.group_columns,
+                'date_column': self.date_column,
+                'prefix': list(self._prefix),
+            }, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode = 'r'):
+        '''
+        index saved to directory path with save. arrays are memory-mapped (unless mmap_mode is None),
+        so loading is instantaneous and only the pages touched by queries are read from disk
+        '''
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+
+        index = cls.__new__(cls)
+        index.calculate_columns = meta['calculate_columns']
+        index.group_columns = meta['group_columns']
+        index.date_column = meta['date_column']
+        for name in cls._ARRAYS:
+            setattr(index, name, np.load(os.path.join(path, f'{name}.npy'), mmap_mode = mmap_mode))
+        index._prefix = {
+            name: np.load(os.path.join(path, f'prefix_{name}.npy'), mmap_mode = mmap_mode) for name in meta['prefix']
+        }
+        index.keys = _group_keys(read_arrow(os.path.join(path, 'keys.arrow')).to_pandas(), index.group_columns)
+        return index
+
+    def query(self, queries, rolling_spec, query_date_column = None, closed = None, suffix = None, min_periods = None):
+        '''
+        computes rolling features of history as of each query point.
+
+        Parameters
+        ----------
+
+        queries: DataFrame
+            DataFrame with group_columns and the as-of date of each query
+
+        rolling_spec: dict
+            maps each window to a list of rolling operations, e.g. {'7D': ['mean','max'], 30: ['sum', ('quantile', {'quantile': 0.9})]}.
+            supported operations are sum, mean, count, var, std (with ddof), min, max, median and quantile (linear interpolation)
+
+        query_date_column: str, default = date_column
+            as-of datetime column of queries
+
+        closed: str, default = "right"
+            whether history rows at the window edges are included: "right" (default) windows are (as_of - window, as_of],
+            "left" [as_of - window, as_of), "both" and "neither" likewise. int windows are the last rows of the group
+            before (or at, if right closed) as_of, with one more row if "both" and one less if "neither", as in pandas
+
+        suffix: Str
+            suffix for features names
+
+        min_periods:
+            minimum number of valid observations in a window to compute a feature, with pandas' defaults
+
+        Returns
+        -------
+        DataFrame with the same index as queries, its group_columns and as-of date, and one column per feature
+        (named as in make_multi_rolling_features)
+        '''
+
+        query_date_column = query_date_column or self.date_column
+        codes = self.keys.get_indexer(_group_keys(queries, self.group_columns))
+        found = codes >= 0
+        codes = np.where(found, codes, len(self.group_starts))
+        lo = np.where(found, np.append(self.group_starts, 0)[codes], 0)
+        hi = np.where(found, np.append(self.group_ends, 0)[codes], 0)
+
+        as_of = _as_int64(queries[query_date_column].values)
+        left_closed = closed in ('left', 'both')
+        right_closed = closed in (None, 'right', 'both')
+        end = _grouped_searchsorted(self.dates, as_of, lo, hi, side = 'right' if right_closed else 'left')
+
+        prefix = self._prefix_sums()
+        features = {}
+        for window, rolling_operations in rolling_spec.items():
+            if isinstance(window, (int, np.integer)):
+                # as in pandas fixed windows, "both" spans one more row and "neither" one less
+                start = np.maximum(lo, end - window - (closed == 'both') + (closed == 'neither'))
+            else:
+                start = _grouped_searchsorted(
+                    self.dates, as_of - _window_to_int64(window), lo, end, side = 'left' if left_closed else 'right'
+                )
+
+            moments = _window_moments(prefix, start, end, lo)
+            for rolling_operation in rolling_operations:
+                if isinstance(rolling_operation, str):
+                    rolling_operation, rolling_operation_kwargs = rolling_operation, {}
+                else:
+                    rolling_operation, rolling_operation_kwargs = rolling_operation
+
+                if not rolling_operation in _LOOKUP_OPERATIONS:
+                    raise ValueError(f'point in time lookups support only {_LOOKUP_OPERATIONS}, not {rolling_operation}')
+
+                values, nobs = _aggregate_windows(
+                    rolling_operation, self.values, moments, prefix['mean'][codes], start, end, **rolling_operation_kwargs
+                )
+                # as in pandas, count checks min_periods against rows, not valid observations
+                observations = np.broadcast_to((end - start)[:, None], nobs.shape) if rolling_operation == 'count' else nobs
+                values[observations < _default_min_periods(window, min_periods, rolling_operation)] = np.nan
+                for i, col in enumerate(self.calculate_columns):
+                    features[_multi_rolling_feature_name(col, rolling_operation, window, suffix, rolling_operation_kwargs)] = values[:, i]
+
+        return pd.concat(
+            [queries[[*self.group_columns, query_date_column]], pd.DataFrame(features, index = queries.index)],
+            axis = 1
+        )
+
+def make_point_in_time_features(
+    history,
+    queries,
+    calculate_columns,
+    group_columns,
+    date_column,
+    rolling_spec,
+    query_date_column = None,
+    closed = None,
+    suffix = None,
+    min_periods = None,
+):
+    '''
+    point in time (as-of) rolling features: computes each window aggregate of history only at the query points,
+    instead of rolling over the entire history and merging. see PointInTimeIndex, which can be kept around to
+    answer several batches of queries over the same history
+
+    Parameters
+    ----------
+
+    history: DataFrame
+        DataFrame with past observations
+
+    queries: DataFrame
+        DataFrame with group_columns and the as-of date of each query
+
+    calculate_columns: list of str
+        list of columns to compute features of
+
+    group_columns: list of str
+        list of columns identifying each group (e.g. customer)
+
+    date_column: str
+        datetime column of history
+
+    rolling_spec: dict
+        maps each window to a list of rolling operations. please refer to PointInTimeIndex.query
+
+    query_date_column: str, default = date_column
+        as-of datetime column of queries
+
+    closed: str, default = "right"
+        please refer to PointInTimeIndex.query
+
+    suffix: Str
+        suffix for features names
+
+    min_periods:
+        minimum number of valid observations in a window to compute a feature, with pandas' defaults
+
+    Returns
+    -------
+    DataFrame with the same index as queries, its group_columns and as-of date, and the features
+    '''
+
+    return PointInTimeIndex(history, calculate_columns, group_columns, date_column).query(
+        queries, rolling_spec, query_date_column = query_date_column, closed = closed, suffix = suffix, min_periods = min_periods
+    )
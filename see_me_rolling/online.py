@@ -0,0 +1,708 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: notebooks_dev/online.ipynb (unless otherwise specified).
+
+__all__ = ['OnlineRollingFeatures', 'AsyncRollingFeatures']
+
+# Cell
+import os
+import json
+import shutil
+import uuid
+import time
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import numpy as np
+
+from .rolling import (
+    _get_group_codes, _get_sorted_order, _get_group_starts, _as_int64, _window_to_int64,
+    _default_min_periods, _multi_rolling_feature_name
+)
+from .streaming import _group_keys, read_arrow
+from .lookup import _ADDITIVE_OPERATIONS, _LOOKUP_OPERATIONS, _aggregate_windows
+from .lazy import lazy_import, lazy_njit
+
+_pa = lazy_import('pyarrow')
+
+
+# Cell
+class _GroupBuffer:
+    '''
+    rows of one group that can still fall inside a window (live rows are start:end), with prefix sums of valid
+    observations and of values and squares centered by shift. arrays grow by doubling, and rows evicted from the front
+    are dropped (and prefix sums rebased) when the buffer is compacted, so memory and sums are bounded by live rows
+    '''
+    __slots__ = ('dates', 'values', 'prefix', 'shift', 'start', 'end', 'last')
+
+    def __init__(self, shift, capacity = 16):
+        self.shift = shift
+        self.dates = np.empty(capacity, dtype = np.int64)
+        self.values = np.empty((capacity, len(shift)))
+        self.prefix = {name: np.zeros((capacity + 1, len(shift))) for name in ('count', 'sum', 'sumsq')}
+        self.start = self.end = 0
+        self.last = None # features of the last row
+
+    def _accumulate(self, begin, end):
+        '''
+        prefix sums of rows begin:end, continuing the ones of rows before begin
+        '''
+        values = self.values[begin:end]
+        valid = ~np.isnan(values)
+        centered = np.where(valid, values - self.shift, 0.)
+        for name, rows in (('count', valid), ('sum', centered), ('sumsq', centered**2)):
+            prefix = self.prefix[name]
+            prefix[begin + 1:end + 1] = prefix[begin] + np.cumsum(rows, axis = 0)
+
+    def _compact(self, n_new):
+        '''
+        moves live rows to the front (growing arrays if they are more than half full) and centers them by their mean,
+        so sums stay accurate when values drift away from the first ones seen
+        '''
+        live = self.end - self.start
+        capacity = len(self.dates)
+        if live + n_new > capacity//2:
+            capacity = 2*(live + n_new)
+
+        dates = np.empty(capacity, dtype = np.int64)
+        dates[:live] = self.dates[self.start:self.end]
+        values = np.empty((capacity, len(self.shift)))
+        values[:live] = self.values[self.start:self.end]
+        self.dates, self.values = dates, values
+        self.prefix = {name: np.zeros((capacity + 1, len(self.shift))) for name in self.prefix}
+        self.start, self.end = 0, live
+
+        valid = ~np.isnan(values[:live])
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            means = np.where(valid, values[:live], 0.).sum(0)/valid.sum(0)
+        self.shift = np.where(valid.any(0), means, self.shift)
+        self._accumulate(0, live)
+
+    def append(self, dates, values, keep_from):
+        '''
+        evicts rows before position keep_from and appends rows (sorted by date, not older than the live ones)
+        '''
+        self.start = max(self.start, keep_from)
+        if self.end + len(dates) > len(self.dates):
+            self._compact(len(dates))
+
+        # columns without live observations are centered by the mean of new ones
+        valid = ~np.isnan(values)
+        unset = (self.prefix['count'][self.end] == self.prefix['count'][self.start]) & valid.any(0)
+        if unset.any():
+            with np.errstate(invalid = 'ignore', divide = 'ignore'):
+                means = np.where(valid, values, 0.).sum(0)/valid.sum(0)
+            self.shift = np.where(unset, means, self.shift)
+
+        end = self.end + len(dates)
+        self.dates[self.end:end] = dates
+        self.values[self.end:end] = values
+        self._accumulate(self.end, end)
+        self.end = end
+
+    def load(self, dates, values):
+        '''
+        fills an empty buffer with the live rows of a snapshot, keeping the shift they were centered by
+        (append would center columns of an empty buffer by the mean of the new rows)
+        '''
+        end = len(dates)
+        self.dates[:end] = dates
+        self.values[:end] = values
+        self._accumulate(0, end)
+        self.start, self.end = 0, end
+
+@lazy_njit(nogil = True)
+def _additive_features(
+    count, centered_sum, centered_sumsq, shift, starts, ends, windows, operations, ddofs, min_periods, slots, out
+):
+    '''
+    additive features (operations are positions in _ADDITIVE_OPERATIONS) of windows starts[window]:ends[window], from prefix sums,
+    written to out[:, slot*n_columns:(slot + 1)*n_columns]. features with less than min_periods valid observations
+    (rows, for count) are NaN
+    '''
+    n_columns = len(shift)
+    for i in range(ends.shape[1]):
+        for f in range(len(operations)):
+            s, e = starts[windows[f], i], ends[windows[f], i]
+            for j in range(n_columns):
+                column = slots[f]*n_columns + j
+                nobs = count[e, j] - count[s, j]
+                # as in pandas, count checks min_periods against rows, not valid observations
+                if (e - s if operations[f] == 2 else nobs) < min_periods[f]:
+                    out[i, column] = np.nan
+                    continue
+
+                total = centered_sum[e, j] - centered_sum[s, j]
+                if operations[f] == 0: # sum
+                    out[i, column] = total + nobs*shift[j]
+                elif operations[f] == 1: # mean
+                    out[i, column] = total/nobs + shift[j] if nobs > 0 else np.nan
+                elif operations[f] == 2: # count
+                    out[i, column] = nobs
+                elif nobs - ddofs[f] <= 0:
+                    out[i, column] = np.nan
+                elif nobs == 1:
+                    out[i, column] = 0. # as in pandas, not the rounding error of the prefix sums
+                else:
+                    var = max(centered_sumsq[e, j] - centered_sumsq[s, j] - total*total/nobs, 0.)/(nobs - ddofs[f])
+                    out[i, column] = var if operations[f] == 3 else np.sqrt(var) # var or std
+
+def _window_to_json(window):
+    '''
+    json serializable window: ints (row counts) and offset strings as they are,
+    timedeltas and DateOffsets tagged with their type
+    '''
+    if isinstance(window, (int, np.integer)):
+        return int(window)
+    if isinstance(window, str):
+        return window
+    if isinstance(window, pd.DateOffset):
+        return {'offset': window.freqstr}
+
+    return {'timedelta': pd.Timedelta(window).value}
+
+def _window_from_json(window):
+    '''
+    window saved by _window_to_json
+    '''
+    if isinstance(window, dict) and 'offset' in window:
+        return pd.tseries.frequencies.to_offset(window['offset'])
+    if isinstance(window, dict):
+        return pd.Timedelta(window['timedelta'])
+
+    return window
+
+class OnlineRollingFeatures:
+    '''
+    stateful, in-process rolling feature engine for real time scoring.
+    events are ingested one at a time (ingest) or in micro batches (update), and the features of each event are
+    returned as they are ingested, with the same values make_multi_rolling_features gives for those rows over
+    the whole history.
+    each group keeps a buffer of the rows its windows can still reach, with prefix sums of valid observations and of
+    values and squares, so additive operations (sum, mean, count, var, std) cost O(1) per event and min, max, median
+    and quantile reduce only the rows of the event's window. state can be saved with snapshot and loaded back with
+    OnlineRollingFeatures.restore, so services restart without replaying history.
+
+    Parameters
+    ----------
+
+    calculate_columns: list of str
+        list of columns to compute features of
+
+    group_columns: list of str
+        list of columns identifying each group (e.g. customer)
+
+    date_column: str
+        datetime column of events. events of each group should not be older than the ones already ingested
+
+    rolling_spec: dict
+        maps each window (row count, offset str, timedelta or DateOffset) to a list of rolling operations, e.g. {'7D': ['mean','max'], 30: ['sum', ('quantile', {'quantile': 0.9})]}.
+        supported operations are sum, mean, count, var, std (with ddof), min, max, median and quantile (linear interpolation)
+
+    closed: str, default = "right"
+        DataFrameGroupBy.Rolling parameter. please refer to documentation
+
+    suffix: Str
+        suffix for features names
+
+    min_periods:
+        minimum number of valid observations in a window to compute a feature, with pandas' defaults
+    '''
+
+    def __init__(
+        self, calculate_columns, group_columns, date_column, rolling_spec, closed = None, suffix = None, min_periods = None
+    ):
+        self.calculate_columns = list(calculate_columns)
+        self.group_columns = list(group_columns)
+        self.date_column = date_column
+        self.rolling_spec = rolling_spec
+        self.closed = closed
+        self.suffix = suffix
+        self.min_periods = min_periods
+
+        self._windows = []
+        self.feature_names = []
+        additive, self._reductions = [], []
+        for w, (window, rolling_operations) in enumerate(rolling_spec.items()):
+            for rolling_operation in rolling_operations:
+                if isinstance(rolling_operation, str):
+                    rolling_operation, rolling_operation_kwargs = rolling_operation, {}
+                else:
+                    rolling_operation, rolling_operation_kwargs = rolling_operation
+
+                if not rolling_operation in _LOOKUP_OPERATIONS:
+                    raise ValueError(f'online features support only {_LOOKUP_OPERATIONS}, not {rolling_operation}')
+
+                slot = len(self.feature_names)//len(self.calculate_columns)
+                min_periods_ = _default_min_periods(window, min_periods, rolling_operation)
+                if rolling_operation in _ADDITIVE_OPERATIONS:
+                    additive.append((
+                        w, _ADDITIVE_OPERATIONS.index(rolling_operation), rolling_operation_kwargs.get('ddof', 1),
+                        min_periods_, slot
+                    ))
+                else:
+                    self._reductions.append((w, slot, rolling_operation, rolling_operation_kwargs, min_periods_))
+
+                self.feature_names += [
+                    _multi_rolling_feature_name(col, rolling_operation, window, suffix, rolling_operation_kwargs)
+                    for col in self.calculate_columns
+                ]
+
+            is_int = isinstance(window, (int, np.integer))
+            self._windows.append((is_int, window if is_int else _window_to_int64(window)))
+
+        # windows, operations, ddofs, min_periods and slots of additive features, as arrays for _additive_features
+        self._additive = tuple(np.ascontiguousarray(i) for i in np.array(additive, dtype = np.int64).reshape(-1, 5).T)
+
+        int_windows = [window for is_int, window in self._windows if is_int]
+        time_windows = [window for is_int, window in self._windows if not is_int]
+        # rows kept before new events: one more than the longest fixed window (for closed = "both")
+        # and the ones inside the longest time window
+        self._max_rows = max(int_windows) + 1 if int_windows else None
+        self._max_time = max(time_windows) if time_windows else None
+        self._groups = {}
+
+    def _keep_from(self, buffer, first_date):
+        '''
+        first row of buffer that can still fall inside windows of events from first_date on
+        '''
+        keep_from = buffer.end
+        if self._max_rows is not None:
+            keep_from = min(keep_from, buffer.end - self._max_rows)
+        if self._max_time is not None:
+            keep_from = min(keep_from, buffer.start + np.searchsorted(
+                buffer.dates[buffer.start:buffer.end], first_date - self._max_time, side = 'left'
+            ))
+        return max(keep_from, buffer.start)
+
+    def _check_order(self, key, first_date):
+        '''
+        raises ValueError if events of group key from first_date on are older than the last one ingested
+        '''
+        buffer = self._groups.get(key)
+        if buffer is not None and buffer.end > buffer.start and first_date < buffer.dates[buffer.end - 1]:
+            raise ValueError(f'events of group {key} are older than the last one ingested')
+
+    def _ingest(self, key, dates, values):
+        '''
+        appends events (sorted by date) of group key and returns their features, as a 2d array
+        '''
+        self._check_order(key, dates[0])
+        buffer = self._groups.get(key)
+        if buffer is None:
+            buffer = self._groups[key] = _GroupBuffer(np.zeros(len(self.calculate_columns)))
+
+        buffer.append(dates, values, self._keep_from(buffer, dates[0]))
+
+        positions = np.arange(buffer.end - len(dates), buffer.end)
+        right_closed = self.closed not in ('left', 'neither')
+        live_dates = buffer.dates[buffer.start:buffer.end]
+        starts = np.empty((len(self._windows), len(dates)), dtype = np.int64)
+        ends = np.empty((len(self._windows), len(dates)), dtype = np.int64)
+        for w, (is_int, window) in enumerate(self._windows):
+            if is_int:
+                ends[w] = positions + 1 if right_closed else positions
+                # as in pandas fixed windows, "both" spans one more row and "neither" one less
+                starts[w] = np.maximum(buffer.start, ends[w] - window - (self.closed == 'both') + (self.closed == 'neither'))
+            else:
+                # as in pandas time windows, open right ends leave out every row dated as the event
+                ends[w] = positions + 1 if right_closed else buffer.start + np.searchsorted(live_dates, dates, side = 'left')
+                starts[w] = np.minimum(ends[w], buffer.start + np.searchsorted(
+                    live_dates, dates - window, side = 'left' if self.closed in ('left', 'both') else 'right'
+                ))
+
+        features = np.empty((len(dates), len(self.feature_names)))
+        _additive_features(
+            buffer.prefix['count'], buffer.prefix['sum'], buffer.prefix['sumsq'], buffer.shift, starts, ends,
+            *self._additive, features
+        )
+        n_columns = len(self.calculate_columns)
+        for w, slot, rolling_operation, rolling_operation_kwargs, min_periods in self._reductions:
+            nobs = buffer.prefix['count'][ends[w]] - buffer.prefix['count'][starts[w]]
+            result, _ = _aggregate_windows(
+                rolling_operation, buffer.values, (nobs, None, None), buffer.shift, starts[w], ends[w],
+                **rolling_operation_kwargs
+            )
+            result[nobs < min_periods] = np.nan
+            features[:, slot*n_columns:(slot + 1)*n_columns] = result
+
+        buffer.last = features[-1]
+        return features
+
+    def ingest(self, key, date, values):
+        '''
+        ingests a single event and returns its features, in the order of feature_names.
+
+        Parameters
+        ----------
+
+        key:
+            group key of the event: a scalar for a single group column, a tuple otherwise
+
+        date:
+            datetime of the event
+
+        values: array like
+            values of calculate_columns
+
+        Returns
+        -------
+        1d array of features
+        '''
+        return self._ingest(
+            key, np.array([pd.Timestamp(date).value]), np.asarray(values, dtype = np.float64).reshape(1, -1)
+        )[0]
+
+    def ingest_batch(self, keys, dates, values):
+        '''
+        ingests a batch of events given as sequences, without building a DataFrame.
+        rows of each group are ingested in date order (and in arrival order for equal dates).
+        the batch is ingested whole or not at all: if events of any group are older than the last one ingested,
+        ValueError is raised before any state changes
+
+        Parameters
+        ----------
+
+        keys: sequence
+            group key of each event (scalars for a single group column, tuples otherwise)
+
+        dates: sequence
+            datetime of each event
+
+        values: 2d array like
+            values of calculate_columns of each event
+
+        Returns
+        -------
+        2d array of features, one row per event, in the order of feature_names
+        '''
+        dates = _as_int64(pd.to_datetime(pd.Series(dates)).values)
+        values = np.asarray(values, dtype = np.float64).reshape(len(dates), -1)
+        group_rows = {}
+        for i, key in enumerate(keys):
+            group_rows.setdefault(key, []).append(i)
+
+        group_rows = {key: np.array(rows) for key, rows in group_rows.items()}
+        group_rows = {key: rows[np.argsort(dates[rows], kind = 'stable')] for key, rows in group_rows.items()}
+        # batches are ingested whole or not at all: every group is checked before any buffer changes
+        for key, rows in group_rows.items():
+            self._check_order(key, dates[rows[0]])
+
+        features = np.empty((len(dates), len(self.feature_names)))
+        for key, rows in group_rows.items():
+            features[rows] = self._ingest(key, dates[rows], values[rows])
+
+        return features
+
+    def update(self, events):
+        '''
+        ingests a micro batch of events and returns their features.
+        rows of each group are ingested in date order (and in the order of events for equal dates).
+        as in ingest_batch, nothing is ingested if events of any group are older than the last one ingested
+
+        Parameters
+        ----------
+
+        events: DataFrame
+            DataFrame with group_columns, date_column and calculate_columns
+
+        Returns
+        -------
+        DataFrame with the same index as events, its group_columns and date_column, and one column per feature
+        (named as in make_multi_rolling_features)
+        '''
+        codes = _get_group_codes(events, self.group_columns)
+        order = _get_sorted_order(codes, events[self.date_column].values)
+        group_starts = _get_group_starts(codes[order])
+        group_ends = np.append(group_starts[1:], len(order))
+        keys = _group_keys(events[self.group_columns].iloc[order[group_starts]], self.group_columns)
+
+        dates = _as_int64(events[self.date_column].values[order])
+        values = events[self.calculate_columns].values[order].astype(np.float64)
+        for key, start in zip(keys, group_starts):
+            self._check_order(key, dates[start])
+
+        features = np.empty((len(order), len(self.feature_names)))
+        for key, start, end in zip(keys, group_starts, group_ends):
+            features[order[start:end]] = self._ingest(key, dates[start:end], values[start:end])
+
+        return pd.concat(
+            [events[[*self.group_columns, self.date_column]], pd.DataFrame(features, index = events.index, columns = self.feature_names)],
+            axis = 1
+        )
+
+    def get(self, key):
+        '''
+        features of the last event ingested for group key (None if the group was never seen), in the order of feature_names
+        '''
+        buffer = self._groups.get(key)
+        return None if buffer is None else buffer.last
+
+    def snapshot(self, path):
+        '''
+        saves the state (live rows of every group) to directory path, replacing previous snapshots atomically.
+        live rows are stored as .npy files, group keys as an Arrow IPC file and the parameters as json
+        '''
+        buffers = list(self._groups.values())
+        n_columns = len(self.calculate_columns)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        os.makedirs(tmp_path)
+
+        arrays = {
+            'sizes': np.array([buffer.end - buffer.start for buffer in buffers], dtype = np.int64),
+            'dates': np.concatenate([buffer.dates[buffer.start:buffer.end] for buffer in buffers] or [np.empty(0, dtype = np.int64)]),
+            'values': np.concatenate([buffer.values[buffer.start:buffer.end] for buffer in buffers] or [np.empty((0, n_columns))]),
+            'shifts': np.array([buffer.shift for buffer in buffers]).reshape(-1, n_columns),
+            'last': np.array([buffer.last for buffer in buffers]).reshape(-1, len(self.feature_names)),
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_path, f'{name}.npy'), array)
+
+        keys = list(self._groups)
+        if len(self.group_columns) == 1:
+            keys = pd.DataFrame({self.group_columns[0]: keys})
+        else:
+            keys = pd.DataFrame(keys, columns = self.group_columns)
+        table = _pa.Table.from_pandas(keys, preserve_index = False)
+        with _pa.OSFile(os.path.join(tmp_path, 'keys.arrow'), 'wb') as sink:
+            with _pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump({
+                'calculate_columns': self.calculate_columns,
+                'group_columns': self.group_columns,
+                'date_column': self.date_column,
+                'rolling_spec': [(_window_to_json(window), operations) for window, operations in self.rolling_spec.items()],
+                'closed': self.closed,
+                'suffix': self.suffix,
+                'min_periods': self.min_periods,
+            }, f)
+
+        # swap directories, so a crash never leaves a partial snapshot at path
+        old_path = f'{path}.{uuid.uuid4().hex}.old'
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors = True)
+
+    @classmethod
+    def restore(cls, path):
+        '''
+        OnlineRollingFeatures with the state saved to directory path with snapshot
+        '''
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+
+        meta['rolling_spec'] = {_window_from_json(window): rolling_operations for window, rolling_operations in meta['rolling_spec']}
+        engine = cls(**meta)
+
+        arrays = {
+            name: np.load(os.path.join(path, f'{name}.npy')) for name in ('sizes', 'dates', 'values', 'shifts', 'last')
+        }
+        keys = _group_keys(read_arrow(os.path.join(path, 'keys.arrow')).to_pandas(), engine.group_columns)
+        starts = np.cumsum(arrays['sizes']) - arrays['sizes']
+        for i, (key, start, size) in enumerate(zip(keys, starts, arrays['sizes'])):
+            buffer = engine._groups[key] = _GroupBuffer(arrays['shifts'][i], capacity = max(16, 2*size))
+            buffer.load(arrays['dates'][start:start + size], arrays['values'][start:start + size])
+            buffer.last = arrays['last'][i]
+
+        return engine
+
+
+# Cell
+class AsyncRollingFeatures:
+    '''
+    asyncio front end of an OnlineRollingFeatures engine, so scoring services don't block their event loop.
+    concurrent requests are gathered into micro batches, closed when max_batch_size requests are pending or max_delay
+    seconds after the first one arrived, computed at once (OnlineRollingFeatures.ingest_batch) on a worker thread,
+    and the features of each request are dispatched back to its caller.
+    if a batch is rejected (e.g. events older than the last one of their group), its groups are ingested one by one,
+    so only requests of rejected groups fail, and none of their events is ingested (retrying them is safe).
+    batches run one at a time, in arrival order, so requests arriving while a batch is computed join the next one
+    and batches grow with load. latency (from request to result) and batch size percentiles are kept for the last
+    metrics_window requests and batches, see metrics
+
+    Parameters
+    ----------
+
+    engine: OnlineRollingFeatures
+        engine holding the state
+
+    max_batch_size: int, default = 256
+        maximum number of requests per batch
+
+    max_delay: float, default = 0.001
+        maximum time, in seconds, a request waits for its batch to fill up
+
+    executor: concurrent.futures.Executor, default = None
+        executor to compute batches in. defaults to a single worker thread, owned (and shut down) by this object
+
+    metrics_window: int, default = 10000
+        number of latest requests and batches metrics are computed over
+    '''
+
+    def __init__(self, engine, max_batch_size = 256, max_delay = 0.001, executor = None, metrics_window = 10000):
+        self.engine = engine
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._own_executor = executor is None
+        self._executor = ThreadPoolExecutor(max_workers = 1) if executor is None else executor
+        self._latencies = deque(maxlen = metrics_window)
+        self._batch_sizes = deque(maxlen = metrics_window)
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        '''
+        starts batching in the running event loop (done on the first request otherwise)
+        '''
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def ingest(self, key, date, values):
+        '''
+        ingests an event and returns its features, in the order of engine.feature_names.
+        please refer to OnlineRollingFeatures.ingest
+        '''
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((key, date, values, future, time.perf_counter()))
+        return await future
+
+    async def _next_batch(self):
+        '''
+        pending requests, waiting up to max_delay after the first one for the batch to fill up
+        '''
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    def _ingest_batch(self, keys, dates, values):
+        '''
+        features of each request, or the exception rejecting it. when the whole batch is rejected, groups are ingested
+        one by one (each whole or not at all), so requests of other groups are not failed by a rejected one
+        '''
+        try:
+            return list(self.engine.ingest_batch(keys, dates, values))
+        except Exception:
+            pass
+
+        group_requests = {}
+        for i, key in enumerate(keys):
+            group_requests.setdefault(key, []).append(i)
+
+        results = [None]*len(keys)
+        for key, requests in group_requests.items():
+            try:
+                features = self.engine.ingest_batch(
+                    [key]*len(requests), [dates[i] for i in requests], [values[i] for i in requests]
+                )
+            except Exception as exception:
+                features = [exception]*len(requests)
+            for i, result in zip(requests, features):
+                results[i] = result
+
+        return results
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            try:
+                keys, dates, values, futures, arrivals = zip(*batch)
+                try:
+                    results = await loop.run_in_executor(self._executor, self._ingest_batch, keys, dates, values)
+                except Exception as exception:
+                    results = [exception]*len(futures)
+
+                for future, result in zip(futures, results):
+                    if future.done():
+                        continue
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+
+                now = time.perf_counter()
+                self._latencies.extend(now - arrival for arrival in arrivals)
+                self._batch_sizes.append(len(batch))
+            except BaseException as exception:
+                # anything failing outside the engine (e.g. a malformed request) fails the requests of the batch still
+                # pending, and the task goes on with the next batch, instead of leaving callers waiting forever
+                for request in batch:
+                    future = request[3] if len(request) > 3 else None
+                    if isinstance(future, asyncio.Future) and not future.done():
+                        if isinstance(exception, Exception):
+                            future.set_exception(exception)
+                        else:
+                            future.cancel()
+                if not isinstance(exception, Exception):
+                    raise
+            finally:
+                # close waits for every request to be marked done
+                for _ in batch:
+                    self._queue.task_done()
+
+    def metrics(self):
+        '''
+        latency (in seconds, from request to result) and batch size percentiles over the last metrics_window
+        requests and batches
+
+        Returns
+        -------
+        dict with requests, batches, latency_p50, latency_p99, batch_size_mean, batch_size_p50 and batch_size_p99
+        '''
+        latencies = np.array(self._latencies)
+        batch_sizes = np.array(self._batch_sizes)
+        if not len(batch_sizes):
+            latencies = batch_sizes = np.full(1, np.nan)
+
+        return {
+            'requests': len(self._latencies),
+            'batches': len(self._batch_sizes),
+            'latency_p50': np.percentile(latencies, 50),
+            'latency_p99': np.percentile(latencies, 99),
+            'batch_size_mean': batch_sizes.mean(),
+            'batch_size_p50': np.percentile(batch_sizes, 50),
+            'batch_size_p99': np.percentile(batch_sizes, 99),
+        }
+
+    async def close(self):
+        '''
+        waits for pending requests, then stops batching (and the worker thread, if owned)
+        '''
+        if self._task is not None:
+            await self._queue.join()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._own_executor:
+            self._executor.shutdown()
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
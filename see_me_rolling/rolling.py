@@ -1,138 +1,751 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: notebooks_dev/rolling.ipynb (unless otherwise specified).
 
 __all__ = ['make_generic_rolling_features', 'make_generic_resampling_and_shift_features',
-           'create_rolling_resampled_features', 'make_generic_rolling_features',
-           'make_generic_resampling_and_shift_features', 'create_rolling_resampled_features']
+           'create_rolling_resampled_features', 'make_multi_rolling_features', 'make_hierarchical_rolling_features']
 
 # Cell
-from functools import reduce, partial
+from functools import reduce, partial, lru_cache
+from operator import attrgetter
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from multiprocessing import shared_memory
 import datetime as dt
-from tqdm import tqdm
 from warnings import warn
 
 import pandas as pd
 import numpy as np
-import numba
+from numpy.lib.stride_tricks import sliding_window_view
+from pandas.tseries.frequencies import to_offset
+from pandas.tseries.offsets import Tick, Week, MonthEnd, QuarterEnd, YearEnd, BusinessMonthEnd, BQuarterEnd, BYearEnd
+from pandas.arrays import PeriodArray
 
-from dask import dataframe as dd
-from dask import delayed
-from dask.diagnostics import ProgressBar
+from .lazy import lazy_import, lazy_njit, _LazyDispatcher
+from .cache import FeatureCache
+from .diagnostics import _stage, _profiled, _progress
+
+_numba = lazy_import('numba') # imported by the first engine compiling a kernel
+_dask = lazy_import('dask') # only used with dask inputs, which import it
 
 
 # Cell
+def _grouped_searchsorted(values, targets, lo, hi, side = 'left'):
+    '''
+    vectorized np.searchsorted of each target, restricted to values[lo:hi].
+    values must be sorted inside each [lo, hi) range. bisection is performed for all targets at once,
+    so it costs O(len(targets) * log(max(hi - lo))) and never loops over groups in python
+    '''
+    lo = np.array(lo, dtype = np.int64)
+    hi = np.array(hi, dtype = np.int64)
+    if not len(lo):
+        return lo
+
+    last = len(values) - 1
+    for _ in range(int(np.ceil(np.log2((hi - lo).max() + 1)))):
+        mid = (lo + hi)//2
+        mid_values = values[np.minimum(mid, last)]
+        if side == 'left':
+            go_right = (lo < hi) & (mid_values < targets)
+        else:
+            go_right = (lo < hi) & (mid_values <= targets)
+
+        lo = np.where(go_right, mid + 1, lo)
+        hi = np.where(go_right, hi, mid)
+
+    return lo
+
+def _as_int64(dates):
+    '''
+    int64 view of datetime-like (or integer) values, used to compare dates without pandas overhead
+    '''
+    dates = np.asarray(dates)
+    if dates.dtype.kind in 'mM':
+        # windows are in nanoseconds, dates of other units (s, ms, us from pandas 2, Parquet or Arrow) are converted first
+        return dates.astype(f'{dates.dtype.kind}8[ns]', copy = False).view(np.int64)
+
+    return dates.astype(np.int64, copy = False)
+
+def _window_to_int64(window):
+    '''
+    length of a time window (offset str, DateOffset or timedelta) in nanoseconds
+    '''
+    if isinstance(window, (str, pd.DateOffset)):
+        return pd.tseries.frequencies.to_offset(window).nanos
+
+    return pd.Timedelta(window).value
+
+def _get_group_codes(df, group_columns):
+    '''
+    integer code of the group of each row, following groupby (sorted keys) order. rows with null keys get -1
+    '''
+    codes = df.groupby(list(group_columns), sort = True).ngroup()
+    return codes.fillna(-1).values.astype(np.int64)
+
+def _get_sorted_order(codes, dates):
+    '''
+    positions that sort rows by group and date (stable), dropping rows with null group keys
+    '''
+    order = np.lexsort((_as_int64(dates), codes))
+    return order[codes[order] >= 0]
 
-def _get_index_rolling_windows(rolling_obj):
+def _get_group_starts(sorted_codes):
     '''
-    get positional indexes of rows of each rolling window
+    positions where each group begins, given group codes sorted (or at least contiguous)
     '''
+    sorted_codes = np.asarray(sorted_codes)
+    return np.flatnonzero(np.r_[len(sorted_codes) > 0, sorted_codes[1:] != sorted_codes[:-1]])
+
+def _get_presorted_group_starts(df, group_columns, date_column):
+    '''
+    group starts of df if it is already sorted by (group_columns, date_column), else None.
+    a single vectorized pass of comparisons between consecutive rows both checks sortedness and finds group
+    boundaries, without sorting or hashing keys. frames with null group keys are not considered sorted
+    '''
+    n_rows = len(df)
+    same_group = np.ones(max(n_rows - 1, 0), dtype = bool)
+    for col in group_columns:
+        values = df[col]
+        if values.isna().any():
+            return None
+        # categoricals are grouped in the order of their categories
+        values = values.cat.codes.values if isinstance(values.dtype, pd.CategoricalDtype) else values.values
+        if (same_group & (values[1:] < values[:-1])).any():
+            return None
+        same_group &= values[1:] == values[:-1]
+
+    dates = _as_int64(df[date_column].values)
+    if (same_group & (dates[1:] < dates[:-1])).any():
+        return None
+
+    return np.flatnonzero(np.r_[n_rows > 0, ~same_group])
+
+# pandas < 2 counted fixed windows from 0 rows on, later versions default min_periods to the window size for count too
+_COUNT_FROM_EMPTY_WINDOWS = int(pd.__version__.split('.')[0]) < 2
+
+def _default_min_periods(window, min_periods = None, rolling_operation = None):
+    '''
+    pandas default min_periods: the window size for fixed windows (0 for count before pandas 2) and 1 for time windows.
+    count checks min_periods against rows of the window, other operations against valid observations
+    '''
+    if min_periods is not None:
+        return min_periods
+    if not isinstance(window, (int, np.integer)):
+        return 1
+
+    return 0 if rolling_operation == 'count' and _COUNT_FROM_EMPTY_WINDOWS else window
+
+def _get_window_bounds(dates, group_starts, window, closed = None, center = False, min_periods = None):
+    '''
+    get [start, end) positional bounds of every rolling window in a single vectorized pass.
+
+    rows must be contiguous by group (each group beggining at the positions in group_starts)
+    and sorted by date inside each group. window can be an int (fixed number of rows) or
+    a fixed frequency time window (e.g. "7D"), in which case dates are used.
+    bounds follow pandas rolling conventions for closed, center and min_periods;
+    windows with less than min_periods rows are returned empty (start == end).
+
+    returns two int64 arrays, such that window i is made of rows start[i]:end[i]
+    '''
+    n = len(dates)
+    group_starts = np.asarray(group_starts, dtype = np.int64)
+    group_sizes = np.diff(np.append(group_starts, n))
+    first = np.repeat(group_starts, group_sizes)
+    last = np.repeat(group_starts + group_sizes, group_sizes)
+    positions = np.arange(n, dtype = np.int64)
+
+    if isinstance(window, (int, np.integer)):
+
+        offset = (window - 1)//2 if center else 0
+        end = positions + 1 + offset
+        start = end - window
+        if closed in ('left', 'both'):
+            start -= 1
+        if closed in ('left', 'neither'):
+            end -= 1
+
+        start = np.clip(start, first, last)
+        end = np.clip(end, first, last)
 
-    if hasattr(rolling_obj, '_selection'):
-        previous_selection = getattr(rolling_obj, '_selection')
     else:
-        previous_selection = None
 
-    INDEX_LIST = []
-    #define function to append values to global INDEX_LIST since rolling apply won't let return arrays
-    def f(x): INDEX_LIST.append(x.astype(int)); return 0
-    assert '__indexer__' not in rolling_obj.obj.columns, 'DataFrame should not contain any col with "__indexer__" name'
-    rolling_obj.obj = rolling_obj.obj.assign(__indexer__ = np.arange(len(rolling_obj.obj)), inplace = True)
-    rolling_obj._selection = '__indexer__'
-    rolling_obj.apply(f, raw = True)
-    rolling_obj.obj = rolling_obj.obj.drop(columns = ['__indexer__'])
+        dates = _as_int64(dates)
+        width = _window_to_int64(window) # in nanoseconds, window is kept for the min_periods default
+        left_closed = closed in ('left', 'both')
+        right_closed = closed in (None, 'right', 'both')
+        if center:
+            # as in pandas, windows span dates - width/2 to dates + width/2 (rounded as pandas does),
+            # closed on both sides when width/2 is not a whole number of nanoseconds
+            if width % 2:
+                left_closed = right_closed = True
+            start = _grouped_searchsorted(
+                dates, dates - (width + 1)//2, first, positions + 1,
+                side = 'left' if left_closed else 'right'
+            )
+            end = _grouped_searchsorted(
+                dates, dates + width//2, positions, last,
+                side = 'right' if right_closed else 'left'
+            )
+        else:
+            start = _grouped_searchsorted(
+                dates, dates - width, first, positions + 1,
+                side = 'left' if left_closed else 'right'
+            )
+            # open right ends leave out every row dated as the current one, not just the row itself
+            end = positions + 1 if right_closed else _grouped_searchsorted(dates, dates, first, positions + 1, side = 'left')
+
+    too_short = (end - start) < _default_min_periods(window, min_periods)
+    start[too_short] = end[too_short]
+
+    return start, end
 
-    delattr(rolling_obj, '_selection')
+def _get_index_rolling_windows(rolling_obj, min_periods = None):
+    '''
+    get positional bounds of rows of each rolling window of a groupby rolling object.
+
+    instead of materializing one array of positions per row, rows are taken in the
+    order the rolling output comes in (by group, keeping original order inside groups)
+    and each window is described by its start and end offsets.
+
+    returns (order, start, end), such that window i is made of rows order[start[i]:end[i]] of rolling_obj.obj.
+    min_periods overrides the one of rolling_obj
+    '''
 
-    if not previous_selection is None:
-        setattr(rolling_obj, '_selection', previous_selection)
+    # codes of each key (-1 for nulls) are combined as the groupby of _get_group_codes, without group_info
+    # (deprecated, then reshaped, along pandas 2.x)
+    keys = pd.DataFrame(dict(enumerate(rolling_obj._grouper.codes)))
+    codes = _get_group_codes(keys.where(keys >= 0), list(keys.columns))
+    order = np.argsort(codes, kind = 'stable')
+    order = order[codes[order] >= 0] #null group keys are dropped by groupby
+    group_starts = _get_group_starts(codes[order])
+
+    start, end = _get_window_bounds(
+        np.asarray(rolling_obj._on)[order],
+        group_starts,
+        window = rolling_obj.window,
+        closed = rolling_obj.closed,
+        center = rolling_obj.center,
+        min_periods = rolling_obj.min_periods if min_periods is None else min_periods,
+    )
+
+    return order, start, end
 
-    return INDEX_LIST
 
+# Cell
 
 def _apply_custom_rolling(rolling_obj, func, raw = True, engine = 'numpy', *args, **kwargs):
 
     engines = {
         'numpy':_rolling_apply_custom_agg_numpy,
         'pandas':_rolling_apply_custom_agg_pandas,
-        'numba':_rolling_apply_custom_agg_numpy_jit
+        'numba':_rolling_apply_custom_agg_numpy_jit,
+        'online':_rolling_apply_custom_agg_online,
+        'vectorized':_rolling_apply_custom_agg_vectorized,
     }
     _rolling_apply = engines[engine]
 
-    indexes = _get_index_rolling_windows(rolling_obj)
-    if hasattr(rolling_obj, '_selection'):
-        if getattr(rolling_obj, '_selection') is None:
-            values = _rolling_apply(rolling_obj.obj, indexes, func, *args, **kwargs)
+    with _stage('window_bounds', rolling_obj.obj, window = rolling_obj.window):
+        if engine == 'online':
+            # streaming reducers count valid (not null) observations against min_periods, like pandas does
+            kwargs.setdefault('min_periods', _default_min_periods(rolling_obj.window, rolling_obj.min_periods, func))
+            order, start, end = _get_index_rolling_windows(rolling_obj, min_periods = 0)
+        else:
+            order, start, end = _get_index_rolling_windows(rolling_obj)
 
-        values = _rolling_apply(rolling_obj.obj[rolling_obj._selection], indexes, func, *args, **kwargs)
-    else:
-        values = _rolling_apply(rolling_obj.obj, indexes, func, *args, **kwargs)
+    obj = rolling_obj.obj
+    if getattr(rolling_obj, '_selection', None) is not None:
+        obj = obj[rolling_obj._selection]
+
+    with _stage('apply', obj, engine = engine) as stage:
+        values = stage.output(_rolling_apply(obj.iloc[order], start, end, func, *args, **kwargs))
 
     return values
 
 
 
-def _rolling_apply_custom_agg_numpy_jit(df, indexes, func):
+@lru_cache(maxsize = 128)
+def _jit_reducer(func):
     '''
-    applies some aggregation function over groups defined by index.
-    groups are numpy arrays
+    nopython compiled version of func (func itself if it already is a numba.njit function)
     '''
+    if isinstance(func, _LazyDispatcher):
+        return func.compile()
+    if isinstance(func, _numba.core.registry.CPUDispatcher):
+        return func
 
-    dfv = df.values
-    # template of output to create empty array
-    #use this for jit version
-    shape = np.array(func(dfv[:1])).shape
-    #d = [np.empty(*shape) for _ in  range(len(indexes))]
-    result_array = np.empty((len(indexes),*shape))
-
-    @numba.jit(forceobj=True)
-    def _roll_apply(dfv, indexes, func, result_array):
-        for i in np.arange(len(indexes)):
-            data = dfv[indexes[i]]
-            if len(data) > 0:
-                result = func(data)
-                result_array[i] = result
-            else:
-                result = np.empty(shape)
+    return _numba.njit(func)
 
+@lru_cache(maxsize = 128)
+def _make_jit_rolling_apply(func):
+    '''
+    compiles a nopython loop applying func over every window.
+    kernels are cached by reducer, so repeated calls with the same func don't recompile
+    '''
+    func = _jit_reducer(func)
+
+    @_numba.njit(nogil = True)
+    def _roll_apply(values, start, end, result_array, *args):
+        for i in range(len(start)):
+            if end[i] > start[i]:
+                result_array[i] = func(values[start[i]:end[i]], *args)
+            else:
+                result_array[i] = np.nan
 
         return result_array
 
-    return _roll_apply(dfv, indexes, func, result_array)
+    return _roll_apply
+
+def _rolling_apply_custom_agg_numpy_jit(df, start, end, func, *args):
+    '''
+    applies some aggregation function over windows defined by start and end offsets.
+    the whole loop over windows runs in numba nopython mode, so func should be a numba.njit function
+    (plain python functions are compiled on the fly) taking a 2d float64 window (and optional *args),
+    returning a scalar or 1d array.
+    '''
+
+    dfv = np.ascontiguousarray(df.values, dtype = np.float64)
+    start = np.ascontiguousarray(start, dtype = np.int64)
+    end = np.ascontiguousarray(end, dtype = np.int64)
+
+    # template of output to create empty array
+    non_empty = np.flatnonzero(end > start)
+    if len(non_empty):
+        i = non_empty[0]
+        shape = np.shape(_jit_reducer(func)(dfv[start[i]:end[i]], *args))
+    else:
+        shape = ()
+
+    result_array = np.empty((len(start), *shape))
+    return _make_jit_rolling_apply(func)(dfv, start, end, result_array, *args)
 
 
-def _rolling_apply_custom_agg_numpy(df, indexes, func, *args, **kwargs):
+def _rolling_apply_custom_agg_numpy(df, start, end, func, *args, **kwargs):
     '''
-    applies some aggregation function over groups defined by index.
-    groups are numpy arrays
+    applies some aggregation function over windows defined by start and end offsets.
+    windows are numpy arrays (views, no copy is made)
     '''
 
     dfv = df.values
-    d = [[] for _ in range(len(indexes))]
-    for i in tqdm(range(len(indexes))):
-        data = dfv[indexes[i]]
-        if len(data) > 0:
-            result = func(data, *args, **kwargs)
-            d[i] = result
+    d = [[] for _ in range(len(start))]
+    with _progress('numpy rolling apply', len(start)) as progress:
+        for chunk in progress.chunks(len(start)):
+            for i in chunk:
+                if end[i] > start[i]:
+                    result = func(dfv[start[i]:end[i]], *args, **kwargs)
+                    d[i] = result
 
     return d
 
-def _rolling_apply_custom_agg_pandas(df, indexes, func, *args, **kwargs):
+def _rolling_apply_custom_agg_pandas(df, start, end, func, *args, **kwargs):
     '''
-    applies some aggregation function over groups defined by index.
-    groups are pandas dataframes
+    applies some aggregation function over windows defined by start and end offsets.
+    windows are pandas dataframes
     '''
 
     # template of output to create empty array
-    d = [[] for _ in range(len(indexes))]
+    d = [[] for _ in range(len(start))]
 
-    for i in tqdm(range(len(indexes))):
-        data = df.iloc[indexes[i]]
-        if len(data) > 0:
-            result = func(data, *args, **kwargs)
-            d[i] = result
+    with _progress('pandas rolling apply', len(start)) as progress:
+        for chunk in progress.chunks(len(start)):
+            for i in chunk:
+                if end[i] > start[i]:
+                    result = func(df.iloc[start[i]:end[i]], *args, **kwargs)
+                    d[i] = result
 
     return pd.concat(d)
 
+_VECTORIZED_CHUNK_BYTES = 2**26 # memory of gathered windows per call
+_VECTORIZED_MIN_RUN = 16 # shorter runs of full windows are gathered, instead of one call each
+
+def _rolling_apply_custom_agg_vectorized(df, start, end, func, *args, **kwargs):
+    '''
+    applies some aggregation function over windows defined by start and end offsets, many windows per call.
+    func gets a 3d float64 array of windows shaped (n_windows, width, n_columns), where width is the length of
+    the longest window, and should reduce axis 1, returning one row per window (e.g. lambda w: np.nanpercentile(w, 90, axis = 1)).
+    shorter windows (time windows, first rows of each group) are padded with leading NaNs, so func should ignore NaNs.
+
+    runs of consecutive full width windows (fixed windows inside a group) are passed as zero-copy strided views of
+    the values (sliding_window_view), and the other windows are gathered into padded copies of at most
+    _VECTORIZED_CHUNK_BYTES, so func is called about once per group instead of once per window.
+    empty windows are NaN. reducers vectorized over axes (np.nanmedian, np.nansum, dot products) benefit the most,
+    while np.nanpercentile still loops over rows internally
+    '''
+
+    values = np.asarray(df.values, dtype = np.float64)
+    start = np.asarray(start, dtype = np.int64)
+    end = np.asarray(end, dtype = np.int64)
+    lengths = end - start
+    width = int(lengths.max()) if len(lengths) else 0
+    if width == 0:
+        return np.full(len(start), np.nan)
+
+    # windows continuing a run of full width windows, each starting one row after the previous one
+    full = lengths == width
+    continues = np.zeros(len(start), dtype = bool)
+    continues[1:] = full[1:] & full[:-1] & (np.diff(start) == 1)
+    run_starts = np.flatnonzero(~continues)
+    run_ends = np.append(run_starts[1:], len(start))
+    is_run = full[run_starts] & (run_ends - run_starts >= _VECTORIZED_MIN_RUN)
+
+    chunk_size = max(1, _VECTORIZED_CHUNK_BYTES//(8*width*values.shape[1]))
+    views = sliding_window_view(values, width, axis = 0).transpose(0, 2, 1)
+
+    result = None
+    def _store(positions, windows):
+        nonlocal result
+        reduced = np.asarray(func(windows, *args, **kwargs), dtype = np.float64)
+        if result is None:
+            result = np.full((len(start), *reduced.shape[1:]), np.nan)
+        result[positions] = reduced
+        progress.update(len(windows))
+
+    with _progress('vectorized rolling apply', len(start)) as progress:
+        for run_start, run_end in zip(run_starts[is_run], run_ends[is_run]):
+            for chunk_start in range(run_start, run_end, chunk_size):
+                chunk_end = min(chunk_start + chunk_size, run_end)
+                _store(slice(chunk_start, chunk_end), views[start[chunk_start]:start[chunk_end - 1] + 1])
+
+        in_runs = np.repeat(is_run, run_ends - run_starts)
+        gathered = np.flatnonzero(~in_runs & (lengths > 0))
+        for chunk_start in range(0, len(gathered), chunk_size):
+            positions = gathered[chunk_start:chunk_start + chunk_size]
+            rows = end[positions, None] - width + np.arange(width)
+            windows = values[np.maximum(rows, 0)]
+            windows[rows < start[positions, None]] = np.nan
+            _store(positions, windows)
+
+    if result is None:
+        return np.full(len(start), np.nan)
+
+    return result
+
+# Cell
+@lazy_njit(nogil = True)
+def _online_moments(values, start, end):
+    '''
+    slides over windows adding and removing one row at a time, keeping per column
+    the number of valid observations, Kahan compensated sum and Welford mean and M2.
+    windows are expected to move forward (as in a sorted groupby rolling); whenever a window
+    moves backwards or jumps ahead of the current one, state is rebuilt from scratch.
+    NaNs are skipped. as in pandas, M2 is set to exactly 0 when the last nobs values added are equal
+    '''
+    n_windows, n_cols = len(start), values.shape[1]
+    nobs = np.zeros((n_windows, n_cols))
+    sums = np.zeros((n_windows, n_cols))
+    m2s = np.zeros((n_windows, n_cols))
+
+    for col in range(n_cols):
+        n = 0.
+        s = 0.
+        comp = 0.
+        mean = 0.
+        m2 = 0.
+        prev = np.nan
+        n_same = 0
+        cur_start = 0
+        cur_end = 0
+        for i in range(n_windows):
+            if start[i] < cur_start or end[i] < cur_end or start[i] >= cur_end:
+                n = 0.
+                s = 0.
+                comp = 0.
+                mean = 0.
+                m2 = 0.
+                prev = np.nan
+                n_same = 0
+                cur_start = start[i]
+                cur_end = start[i]
+
+            for j in range(cur_end, end[i]):
+                x = values[j, col]
+                if not np.isnan(x):
+                    n += 1.
+                    y = x - comp
+                    t = s + y
+                    comp = (t - s) - y
+                    s = t
+                    delta = x - mean
+                    mean += delta/n
+                    m2 += delta*(x - mean)
+                    if x == prev:
+                        n_same += 1
+                    else:
+                        n_same = 1
+                    prev = x
+
+            for j in range(cur_start, start[i]):
+                x = values[j, col]
+                if not np.isnan(x):
+                    n -= 1.
+                    y = -x - comp
+                    t = s + y
+                    comp = (t - s) - y
+                    s = t
+                    if n > 0:
+                        delta = x - mean
+                        mean -= delta/n
+                        m2 -= delta*(x - mean)
+                    else:
+                        mean = 0.
+                        m2 = 0.
+
+            cur_start = start[i]
+            cur_end = end[i]
+            nobs[i, col] = n
+            sums[i, col] = s
+            m2s[i, col] = 0. if n_same >= n else max(m2, 0.)
+
+    return nobs, sums, m2s
+
+@lazy_njit(nogil = True)
+def _online_extreme(values, start, end, is_max):
+    '''
+    sliding min (or max) using a monotonic deque of row positions per column, so each row is
+    pushed and popped at most once. NaNs are skipped
+    '''
+    n_windows, n_cols = len(start), values.shape[1]
+    result = np.full((n_windows, n_cols), np.nan)
+    deque = np.empty(len(values), dtype = np.int64)
+
+    for col in range(n_cols):
+        head = 0
+        tail = 0
+        cur_start = 0
+        cur_end = 0
+        for i in range(n_windows):
+            if start[i] < cur_start or end[i] < cur_end or start[i] >= cur_end:
+                head = 0
+                tail = 0
+                cur_end = start[i]
+
+            for j in range(cur_end, end[i]):
+                x = values[j, col]
+                if np.isnan(x):
+                    continue
+                if is_max:
+                    while tail > head and values[deque[tail - 1], col] <= x:
+                        tail -= 1
+                else:
+                    while tail > head and values[deque[tail - 1], col] >= x:
+                        tail -= 1
+                deque[tail] = j
+                tail += 1
+
+            while tail > head and deque[head] < start[i]:
+                head += 1
+
+            cur_start = start[i]
+            cur_end = end[i]
+            if tail > head:
+                result[i, col] = values[deque[head], col]
+
+    return result
+
+@lazy_njit(nogil = True)
+def _online_ewm(values, start, end, alpha):
+    '''
+    exponentially weighted mean inside each window, weights decaying by (1 - alpha) per row
+    from the last row of the window. rows leaving the window are subtracted with their current weight.
+    NaNs are skipped but still decay weights, as in pandas ewm(ignore_na = False)
+    '''
+    n_windows, n_cols = len(start), values.shape[1]
+    result = np.full((n_windows, n_cols), np.nan)
+    decay = 1. - alpha
+
+    for col in range(n_cols):
+        s = 0.
+        w = 0.
+        cur_start = 0
+        cur_end = 0
+        for i in range(n_windows):
+            if start[i] < cur_start or end[i] < cur_end or start[i] >= cur_end:
+                s = 0.
+                w = 0.
+                cur_start = start[i]
+                cur_end = start[i]
+
+            for j in range(cur_end, end[i]):
+                x = values[j, col]
+                s *= decay
+                w *= decay
+                if not np.isnan(x):
+                    s += x
+                    w += 1.
+
+            for j in range(cur_start, start[i]):
+                x = values[j, col]
+                if not np.isnan(x):
+                    weight = decay**(end[i] - 1 - j)
+                    s -= weight*x
+                    w -= weight
+
+            cur_start = start[i]
+            cur_end = end[i]
+            if w > 1e-12:
+                result[i, col] = s/w
+
+    return result
+
+@lazy_njit(nogil = True)
+def _online_quantile(values, start, end, quantile):
+    '''
+    sliding quantile (linear interpolation, as pandas) keeping the valid values of the window in a sorted buffer,
+    where rows are inserted and removed by binary search. NaNs are skipped
+    '''
+    n_windows, n_cols = len(start), values.shape[1]
+    result = np.full((n_windows, n_cols), np.nan)
+    buffer = np.empty(len(values))
+
+    for col in range(n_cols):
+        size = 0
+        cur_start = 0
+        cur_end = 0
+        for i in range(n_windows):
+            if start[i] < cur_start or end[i] < cur_end or start[i] >= cur_end:
+                size = 0
+                cur_start = start[i]
+                cur_end = start[i]
+
+            for j in range(cur_end, end[i]):
+                x = values[j, col]
+                if not np.isnan(x):
+                    position = np.searchsorted(buffer[:size], x)
+                    buffer[position + 1:size + 1] = buffer[position:size].copy()
+                    buffer[position] = x
+                    size += 1
+
+            for j in range(cur_start, start[i]):
+                x = values[j, col]
+                if not np.isnan(x):
+                    position = np.searchsorted(buffer[:size], x)
+                    buffer[position:size - 1] = buffer[position + 1:size].copy()
+                    size -= 1
+
+            cur_start = start[i]
+            cur_end = end[i]
+            if size > 0:
+                index = quantile*(size - 1)
+                low = int(np.floor(index))
+                high = min(low + 1, size - 1)
+                result[i, col] = buffer[low] + (buffer[high] - buffer[low])*(index - low)
+
+    return result
+
+@lazy_njit(parallel = True, nogil = True)
+def _grouped_moments(values, start, end, group_starts):
+    '''
+    _online_moments computed in parallel over groups (rows of each group are contiguous, beginning at group_starts)
+    '''
+    nobs = np.empty((len(start), values.shape[1]))
+    sums = np.empty((len(start), values.shape[1]))
+    m2s = np.empty((len(start), values.shape[1]))
+    bounds = np.append(group_starts, len(start))
+    for g in _numba.prange(len(group_starts)):
+        a, b = bounds[g], bounds[g + 1]
+        nobs[a:b], sums[a:b], m2s[a:b] = _online_moments(values[a:b], start[a:b] - a, end[a:b] - a)
+
+    return nobs, sums, m2s
+
+@lazy_njit(parallel = True, nogil = True)
+def _grouped_apply(kernel, values, start, end, group_starts, param):
+    '''
+    online kernel (_online_extreme, _online_quantile or _online_ewm) computed in parallel over groups
+    '''
+    result = np.empty((len(start), values.shape[1]))
+    bounds = np.append(group_starts, len(start))
+    for g in _numba.prange(len(group_starts)):
+        a, b = bounds[g], bounds[g + 1]
+        result[a:b] = kernel(values[a:b], start[a:b] - a, end[a:b] - a, param)
+
+    return result
+
+def _ewm_alpha(com = None, span = None, halflife = None, alpha = None):
+    '''
+    smoothing factor from one of pandas ewm decay parametrizations
+    '''
+    if com is not None:
+        return 1/(1 + com)
+    if span is not None:
+        return 2/(span + 1)
+    if halflife is not None:
+        return 1 - np.exp(np.log(0.5)/halflife)
+    if alpha is not None:
+        return alpha
+
+    raise ValueError('one of com, span, halflife or alpha must be passed to ewm')
+
+def _rolling_apply_custom_agg_online(df, start, end, func, min_periods = 1, ddof = 1, group_starts = None, **kwargs):
+    '''
+    applies a streaming reducer over windows defined by start and end offsets,
+    updating state by adding and removing one row at a time instead of reducing every window from scratch,
+    so long windows cost the same as short ones.
+
+    func is the name of the reducer, one of
+    "sum", "mean", "count", "var", "std", "min", "max", "median", "quantile" (requires q, or quantile),
+    "ewm" (requires com, span, halflife or alpha), "weighted_sum" and "weighted_mean" (the last column holds the weights of each row).
+
+    if group_starts (positions where each group of contiguous rows begins) is passed,
+    groups are processed in parallel, in numba threads that release the GIL.
+
+    returns a 2d array with one row per window. windows with less than min_periods valid observations are NaN
+    '''
+
+    def _moments(values):
+        if group_starts is None:
+            return _online_moments(values, start, end)
+        return _grouped_moments(values, start, end, group_starts)
+
+    def _apply(kernel, param):
+        if group_starts is None:
+            return kernel(values, start, end, param)
+        return _grouped_apply(kernel, values, start, end, group_starts, param)
+
+    values = np.ascontiguousarray(df.values, dtype = np.float64)
+    start = np.ascontiguousarray(start, dtype = np.int64)
+    end = np.ascontiguousarray(end, dtype = np.int64)
+
+    if func in ('weighted_sum', 'weighted_mean'):
+        weights = np.where(np.isnan(values[:, :-1]), np.nan, values[:, -1:])
+        values = values[:, :-1]
+
+    # valid observations per window, from the cumulative count of not null values
+    valid_cumsum = np.concatenate([np.zeros((1, values.shape[1])), np.cumsum(~np.isnan(values), axis = 0)])
+    nobs = valid_cumsum[end] - valid_cumsum[start]
+    enough = nobs >= max(min_periods, 1)
+
+    if func == 'count':
+        # as in pandas, count checks min_periods against rows, not valid observations
+        return np.where((end - start)[:, None] >= min_periods, nobs, np.nan)
+
+    if func in ('min', 'max'):
+        result = _apply(_online_extreme, func == 'max')
+    elif func in ('median', 'quantile'):
+        # q is the keyword of pandas 2 Rolling.quantile, quantile the deprecated one of pandas 1
+        result = _apply(_online_quantile, 0.5 if func == 'median' else kwargs.get('q', kwargs.get('quantile')))
+    elif func == 'ewm':
+        result = _apply(_online_ewm, _ewm_alpha(**kwargs))
+    elif func in ('weighted_sum', 'weighted_mean'):
+        _, result, _ = _moments(np.ascontiguousarray(values*weights))
+        if func == 'weighted_mean':
+            _, weight_sums, _ = _moments(weights)
+            with np.errstate(invalid = 'ignore', divide = 'ignore'):
+                result = result/weight_sums
+    elif func in ('sum', 'mean', 'var', 'std'):
+        _, sums, m2s = _moments(values)
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            if func == 'sum':
+                result = sums
+            elif func == 'mean':
+                result = sums/nobs
+            else:
+                result = np.where(nobs > ddof, m2s/(nobs - ddof), np.nan)
+                if func == 'std':
+                    result = np.sqrt(result)
+    else:
+        raise ValueError(f'unknown online reducer {func}')
+
+    return np.where(enough, result, np.nan)
+
 # Cell
 def _make_rolling_groupby_object(df, group_columns, date_column):
     '''
@@ -142,6 +755,7 @@ def _make_rolling_groupby_object(df, group_columns, date_column):
 
     return groupby_object
 
+@_profiled
 def make_generic_rolling_features(
     df,
     calculate_columns,
@@ -156,6 +770,10 @@ def make_generic_rolling_features(
     on=None,
     axis=0,
     closed=None,
+    n_jobs=None,
+    backend='pandas',
+    compact=False,
+    assume_sorted=False,
     **rolling_operation_kwargs
 ):
     '''
@@ -166,7 +784,8 @@ def make_generic_rolling_features(
     ----------
 
     df: DataFrame
-        DataFrame to make rolling features over
+        DataFrame to make rolling features over. dask DataFrames (or GroupBys) are shuffled by group_columns once
+        and rolled partition-wise, returning a lazy dask DataFrame
 
     calculate_columns: list of str
         list of columns to perform rolling_operation over
@@ -204,6 +823,28 @@ def make_generic_rolling_features(
     closed:
         DataFrameGroupBy.Rolling parameter. please refer to documentation
 
+    n_jobs: int, default = None
+        number of processes to compute pandas DataFrames with. groups are split in shards computed in parallel,
+        with columns passed through shared memory. -1 uses all cpus, None or 1 runs serially.
+        not supported with backend = "native", which runs groups in parallel threads
+
+    backend: str, default = "pandas"
+        "pandas" uses DataFrameGroupBy.Rolling. "native" computes pandas DataFrames with numba kernels over numpy arrays,
+        reducing all calculate_columns at once, in parallel over groups (supports mean, sum, std, var, min, max, count,
+        median and quantile, with q). much faster when there are many small groups
+
+    compact: bool, default = False
+        returns features as float32 and object group keys as categoricals (see _compact_output).
+        features are still computed in float64, so values are within float32 relative precision (2**-24) of the default
+        output. features that would overflow float32 are kept as float64, with a warning. with dask DataFrames,
+        categories of group keys are computed from the whole input first, so all partitions share them
+
+    assume_sorted: bool, default = False
+        df is already sorted by (group_columns, date_column). this is checked in O(n), and then all sorts and
+        groupbys are skipped: group boundaries come from comparing consecutive rows and rolling_operation runs over all
+        groups at once (ValueError if df is not sorted). dask partitions are only sorted when they don't arrive sorted.
+        ignored by n_jobs and win_type rollings
+
     rolling_operation_kwargs:
         key word arguments passed to rolling_operation
 
@@ -218,82 +859,552 @@ def make_generic_rolling_features(
 
     keep_columns = [*group_columns, date_column, *calculate_columns]
 
-    if not isinstance(df,(
-        dd.groupby.DataFrameGroupBy,
-        pd.core.groupby.generic.DataFrameGroupBy,
-        pd.core.groupby.generic.SeriesGroupBy,
-        dd.groupby.SeriesGroupBy
-    )):
-
-        df = _make_rolling_groupby_object(df, group_columns, date_column)
-
-    if isinstance(df, (pd.core.groupby.generic.DataFrameGroupBy, pd.core.groupby.generic.SeriesGroupBy)):
-
+    if _is_dask(df, _DASK_GROUPBY):
+        # dask groupby objects are computed from their frame, shuffled by group (see _make_dask_rolling_features)
+        df = df.obj if date_column in df.obj.columns else df.obj.reset_index()
+
+    group_starts = None
+    if assume_sorted and isinstance(df, pd.DataFrame):
+        with _stage('check_sorted', df):
+            group_starts = _get_presorted_group_starts(df, group_columns, date_column)
+        if group_starts is None:
+            raise ValueError(
+                'df is not sorted by (group_columns, date_column) or has null group keys, use assume_sorted = False'
+            )
 
-        df = getattr(
-            df[calculate_columns]
-            .rolling(
+    if _is_dask(df):
+
+        with _stage('dask_rolling', df, rolling_operation = rolling_operation, window = window) as stage:
+            features = stage.output(_make_dask_rolling_features(
+                df,
+                calculate_columns = calculate_columns,
+                group_columns = group_columns,
+                date_column = date_column,
+                assume_sorted = assume_sorted,
+                suffix = suffix,
+                rolling_operation = rolling_operation,
                 window = window,
                 min_periods=min_periods,
                 center=center,
                 win_type=win_type,
                 on=on,
                 axis=axis,
-                closed=closed
-            ),
-            rolling_operation,
+                closed=closed,
+                **rolling_operation_kwargs
+            ))
+
+    elif isinstance(df, pd.DataFrame) and backend == 'native':
+
+        if n_jobs not in (None, 1):
+            raise ValueError('backend = "native" already runs groups in parallel threads, it does not support n_jobs')
+
+        with _stage('native_rolling', df, rolling_operation = rolling_operation, window = window) as stage:
+            features = stage.output(_make_native_rolling_features(
+                df,
+                calculate_columns = calculate_columns,
+                group_columns = group_columns,
+                date_column = date_column,
+                suffix = suffix,
+                rolling_operation = rolling_operation,
+                window = window,
+                min_periods=min_periods,
+                center=center,
+                closed=closed,
+                group_starts=group_starts,
+                **rolling_operation_kwargs
+            ))
+
+    elif isinstance(df, pd.DataFrame) and n_jobs not in (None, 1):
+
+        with _stage('parallel_rolling', df, rolling_operation = rolling_operation, window = window) as stage:
+            features = stage.output(_make_parallel_rolling_features(
+                df,
+                calculate_columns = calculate_columns,
+                group_columns = group_columns,
+                date_column = date_column,
+                n_jobs = n_jobs,
+                suffix = suffix,
+                rolling_operation = rolling_operation,
+                window = window,
+                min_periods=min_periods,
+                center=center,
+                win_type=win_type,
+                closed=closed,
+                **rolling_operation_kwargs
+            ))
+
+    elif group_starts is not None and win_type is None:
+
+        with _stage('presorted_rolling', df, rolling_operation = rolling_operation, window = window) as stage:
+            features = stage.output(_make_presorted_rolling_features(
+                df,
+                calculate_columns = calculate_columns,
+                group_columns = group_columns,
+                date_column = date_column,
+                group_starts = group_starts,
+                suffix = suffix,
+                rolling_operation = rolling_operation,
+                window = window,
+                min_periods=min_periods,
+                center=center,
+                closed=closed,
+                **rolling_operation_kwargs
+            ))
+
+    else:
+
+        if not isinstance(df,(
+            pd.core.groupby.generic.DataFrameGroupBy,
+            pd.core.groupby.generic.SeriesGroupBy,
+        )):
+
+            with _stage('set_index_groupby', df) as stage:
+                df = stage.output(_make_rolling_groupby_object(df, group_columns, date_column))
+
+        with _stage('rolling', df, rolling_operation = rolling_operation, window = window) as stage:
+            features = stage.output(getattr(
+                df[calculate_columns]
+                .rolling(
+                    window = window,
+                    min_periods=min_periods,
+                    center=center,
+                    win_type=win_type,
+                    on=on,
+                    axis=axis,
+                    closed=closed
+                ),
+                rolling_operation,
+
+            )(**rolling_operation_kwargs))
+
+        with _stage('reset_index', features) as stage:
+            features = stage.output(features.reset_index())
+
+        with _stage('rename_columns', features):
+            features.columns = [
+                _rolling_feature_name(col, rolling_operation, window, suffix, rolling_operation_kwargs)
+                if not col in (*group_columns, date_column) else col
+                for col in features.columns
+            ]
+
+    if compact:
+        feature_columns = [col for col in features.columns if not col in (*group_columns, date_column)]
+        if _is_dask(features):
+            # partitions would infer categories from their own keys, so they come from the keys of the whole input
+            with _stage('categories', df):
+                categories = _key_categories(df, group_columns)
+            features = features.map_partitions(_compact_output, list(group_columns), feature_columns, categories = categories)
+        else:
+            with _stage('compact', features) as stage:
+                features = stage.output(_compact_output(features, list(group_columns), feature_columns))
+
+    return features
+
+def _rolling_feature_name(col, rolling_operation, window, suffix, rolling_operation_kwargs):
+    '''
+    name of the rolling feature of col
+    '''
+    if not suffix:
+        return f'{col}__rolling_{rolling_operation}_{window}_{str(rolling_operation_kwargs)}'
+    else:
+        return f'{col}__rolling_{window}_{suffix}'
 
-        )(**rolling_operation_kwargs).reset_index()
+def _make_presorted_rolling_features(
+    df, calculate_columns, group_columns, date_column, group_starts, suffix = None, rolling_operation = 'mean',
+    window = '60D', min_periods = None, center = False, closed = None, **rolling_operation_kwargs
+):
+    '''
+    make_generic_rolling_features over a frame already sorted by (group_columns, date_column).
+    window bounds come straight from group_starts, and rolling_operation runs over all groups at once
+    through _WindowBoundsIndexer, without sorting, set_index or groupby
+    '''
+    start, end = _get_window_bounds(
+        df[date_column].values, group_starts, window, closed = closed, center = center, min_periods = 0
+    )
+    rolling = df[calculate_columns].reset_index(drop = True).rolling(
+        _WindowBoundsIndexer(start = start, end = end),
+        min_periods = _default_min_periods(window, min_periods, rolling_operation)
+    )
+    features = getattr(rolling, rolling_operation)(**rolling_operation_kwargs)
+    features.columns = [
+        _rolling_feature_name(col, rolling_operation, window, suffix, rolling_operation_kwargs) for col in calculate_columns
+    ]
+    return pd.concat([df[[*group_columns, date_column]].reset_index(drop = True), features], axis = 1)
 
-    else: #syntax for dask groupby rolling
+def _compact_output(df, group_columns, feature_columns, date_column = None, freq = None, categories = None):
+    '''
+    compact version of a features DataFrame: float64 features as float32, object group keys as categoricals and,
+    if freq is passed, date_column as int32 period codes (ordinals of pd.Period(date, freq)).
+    categories maps group columns to their categories, for outputs computed in parts (e.g. dask partitions)
+    that must share them. otherwise categories are inferred from df.
+    features are cast only after being computed in float64, so float32 values stay within float32 relative precision
+    (2**-24) of the original ones. features that would overflow float32, or fall into its subnormal range (such as
+    large sums or tiny variances), are kept as float64, with a warning
+    '''
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        if col in group_columns and (values.dtype == object or pd.api.types.is_string_dtype(values)):
+            if categories is not None and col in categories:
+                values = values.astype(pd.CategoricalDtype(categories[col]))
+            else:
+                values = values.astype('category')
 
-        df = df[calculate_columns].apply(
-                lambda x: getattr(
-                    x.sort_index().rolling(
-                        window = window,
-                        min_periods=min_periods,
-                        center=center,
-                        win_type=win_type,
-                        on=on,
-                        axis=axis,
-                        closed=closed
-                    ),
-                    rolling_operation,
-                )(**rolling_operation_kwargs).reset_index()
-            #meta = meta, #works only for float rolling
+        elif col in feature_columns and values.dtype == np.float64:
+            magnitudes = np.abs(values.values)
+            magnitudes = magnitudes[np.isfinite(magnitudes) & (magnitudes > 0)]
+            if len(magnitudes) and (magnitudes.max() > _FLOAT32.max or magnitudes.min() < _FLOAT32.tiny):
+                warn(f'{col} is out of float32 range, keeping it as float64')
+            else:
+                values = values.astype(np.float32)
 
-            ).reset_index().drop(columns = [f'level_{len(group_columns)}']) #drop unwanted "level_n" cols
+        elif col == date_column and freq is not None:
+            codes = pd.DatetimeIndex(values).to_period(to_offset(freq)).asi8 # offsets, since periods don't parse ME, QE ...
+            if len(codes) and (codes.min() < np.iinfo(np.int32).min or codes.max() > np.iinfo(np.int32).max):
+                raise ValueError(f'period codes of {date_column} at freq {freq} do not fit in int32')
+            values = pd.Series(codes.astype(np.int32), index = values.index)
 
+        columns[col] = values
 
-    if not suffix:
+    return pd.DataFrame(columns, index = df.index)
 
-        df.columns = [
-            f'{col}__rolling_{rolling_operation}_{window}_{str(rolling_operation_kwargs)}'
-            if not col in (*group_columns, date_column) else col
-            for col in df.columns
-        ]
-    else:
-        df.columns = [
-            f'{col}__rolling_{window}_{suffix}'
-            if not col in (*group_columns, date_column) else col
-            for col in df.columns
-        ]
+_FLOAT32 = np.finfo(np.float32)
 
-    return df
+def _key_categories(df, group_columns):
+    '''
+    categories of the object group columns of a dask DataFrame, as _compact_output infers them from the whole frame.
+    unique keys of all columns are computed at once, before any rolling
+    '''
+    columns = [col for col in group_columns if df[col].dtype == object or pd.api.types.is_string_dtype(df[col])]
+    uniques = _dask.compute(*(df[col].dropna().unique() for col in columns))
+    return {col: pd.Series(unique).astype('category').cat.categories for col, unique in zip(columns, uniques)}
+
+# groupby classes of dask.dataframe, before and after dask-expr became its implementation
+_DASK_GROUPBY = ('groupby.DataFrameGroupBy', 'dask_expr._groupby.GroupBy')
+
+def _is_dask(obj, cls = 'DataFrame'):
+    '''
+    whether obj is an instance of dask.dataframe's cls (attribute path, e.g. "groupby.DataFrameGroupBy", or a tuple
+    of paths, of which the ones missing from the installed dask are skipped).
+    dask objects can't exist before dask.dataframe is imported, so dask is never imported here
+    '''
+    dd = sys.modules.get('dask.dataframe')
+    if dd is None:
+        return False
+
+    classes = []
+    for path in ((cls,) if isinstance(cls, str) else cls):
+        try:
+            classes.append(attrgetter(path)(dd))
+        except AttributeError:
+            pass
+
+    return isinstance(obj, tuple(classes))
+
+# column carrying the position of each row of a dask DataFrame through the shuffle by group
+_DASK_ROW_POSITION = '__see_me_rolling_row_position__'
+
+def _make_dask_rolling_features(df, calculate_columns, group_columns, date_column, assume_sorted = False, **rolling_kwargs):
+    '''
+    distributed make_generic_rolling_features.
+    rows are shuffled by group_columns once, so that every group lives in a single partition,
+    then rolling features are computed partition-wise (sorted by date) by the pandas implementation.
+    the shuffle may reorder rows, so their original position is carried along and breaks ties of (group, date),
+    which time windows include or leave out depending on their order, as pandas does.
+    with assume_sorted, partitions that arrive sorted by group, date and position are not sorted again.
+    meta is built from the input schema, so dask doesn't need to run the function on a sample to infer it
+    '''
+    group_columns = list(group_columns)
+    rolling_operation_kwargs = {
+        k:v for k,v in rolling_kwargs.items()
+        if not k in ('suffix', 'rolling_operation', 'window', 'min_periods', 'center', 'win_type', 'on', 'axis', 'closed')
+    }
+
+    meta = df._meta[[*group_columns, date_column]].assign(**{
+        _rolling_feature_name(
+            col, rolling_kwargs['rolling_operation'], rolling_kwargs['window'], rolling_kwargs['suffix'], rolling_operation_kwargs
+        ): pd.Series(dtype = 'float64')
+        for col in calculate_columns
+    })
+
+    def _partition_rolling(partition):
+        presorted = (
+            assume_sorted and
+            _get_presorted_group_starts(partition, [*group_columns, date_column], _DASK_ROW_POSITION) is not None
+        )
+        if not presorted:
+            partition = partition.sort_values([date_column, _DASK_ROW_POSITION], kind = 'mergesort')
+        return make_generic_rolling_features(
+            partition.drop(columns = _DASK_ROW_POSITION),
+            calculate_columns = calculate_columns,
+            group_columns = group_columns,
+            date_column = date_column,
+            assume_sorted = presorted,
+            **rolling_kwargs
+        )
+
+    df = df[[*group_columns, date_column, *calculate_columns]]
+    return (
+        df.assign(**{_DASK_ROW_POSITION: 1})
+        .assign(**{_DASK_ROW_POSITION: lambda df: df[_DASK_ROW_POSITION].cumsum()})
+        .shuffle(on = group_columns)
+        .map_partitions(_partition_rolling, meta = meta)
+    )
 
 def _make_shift_resample_groupby_object(df, group_columns, date_column,freq, n_periods_shift):
 
     groupby_object = (
             df
-            .assign(**{date_column:df[date_column] + pd.Timedelta(n_periods_shift,freq)}) #shift
+            .assign(**{date_column:_shift_dates(df[date_column], freq, n_periods_shift)}) #shift
             .set_index(date_column)
             .groupby([*group_columns, pd.Grouper(freq = freq)])
         )
     return groupby_object
 
+# offsets pd.Grouper bins closed right, labeled by the end of the period. checked by class, since pandas 2.2 renamed
+# their rule codes (ME, QE-DEC, YE-DEC, BME ...)
+_CLOSED_RIGHT_OFFSETS = (MonthEnd, QuarterEnd, YearEnd, BusinessMonthEnd, BQuarterEnd, BYearEnd, Week)
+
+def _shift_dates(dates, freq, n_periods_shift):
+    '''
+    dates moved so that pd.Grouper(freq = freq) bins them n_periods_shift periods later.
+    ticks (D, H, 3D ...) add n_periods_shift times their length. calendar offsets (M, MS, W-MON, Q ...) roll each date
+    forward onto the offset and add n_periods_shift offsets from there, minus one where rolling forward already
+    crossed into the next bin (offsets binned closed left, as month or quarter starts)
+    '''
+    offset = to_offset(freq)
+    if n_periods_shift == 0:
+        return dates
+    if isinstance(offset, Tick):
+        return dates + n_periods_shift*pd.Timedelta(offset)
+
+    rolled = dates + offset.base*0
+    if isinstance(offset, _CLOSED_RIGHT_OFFSETS):
+        return rolled + n_periods_shift*offset
+    return (rolled + n_periods_shift*offset).where(rolled == dates, rolled + (n_periods_shift - 1)*offset)
+
+_SORTED_RESAMPLING_AGGS = ('sum', 'mean', 'min', 'max', 'count', 'first', 'last', 'std', 'var')
+_NANOSECONDS_PER_DAY = 86_400_000_000_000
+
+def _get_period_codes(dates, freq):
+    '''
+    integer period codes of dates, and a function mapping codes back to the bin labels pd.Grouper(freq = freq) gives them.
+    tick frequencies (D, H, T ...) are binned from midnight of the first day, as resample's default origin = "start_day".
+    month, quarter, year and week ends are binned as calendar periods, labeled by their last day.
+    returns None for frequencies without such arithmetic (business days, month starts, multiples of calendar offsets ...)
+    '''
+    offset = to_offset(freq)
+    dates = pd.DatetimeIndex(dates)
+    if dates.tz is not None:
+        return None
+
+    if isinstance(offset, Tick):
+        step = offset.nanos
+        if _NANOSECONDS_PER_DAY % step and step % _NANOSECONDS_PER_DAY:
+            # bins wouldn't line up with the per group resample of assert_frequency
+            return None
+        origin = dates.min().normalize().value
+        codes = (dates.asi8 - origin)//step
+        return codes, lambda codes: pd.DatetimeIndex(origin + codes*step)
+
+    if offset.n == 1 and (isinstance(offset, (MonthEnd, QuarterEnd, YearEnd)) or (isinstance(offset, Week) and offset.weekday is not None)):
+        periods = dates.to_period(offset)
+        return periods.asi8, lambda codes: pd.DatetimeIndex(
+            PeriodArray(codes, dtype = periods.dtype).to_timestamp(how = 'end').normalize()
+        )
+
+    return None
+
+def _segment_reduce(values, segment_starts, agg, ddof = 1):
+    '''
+    reduces values over the contiguous segments starting at segment_starts with ufunc.reduceat.
+    NaNs are skipped, as in groupby aggregations
+    '''
+    n = len(values)
+    if agg in ('first', 'last'):
+        valid = ~pd.isna(values)
+        if agg == 'first':
+            positions = np.minimum.reduceat(np.where(valid, np.arange(n), n), segment_starts)
+            found = positions < n
+        else:
+            positions = np.maximum.reduceat(np.where(valid, np.arange(n), -1), segment_starts)
+            found = positions >= 0
+        result = values[np.where(found, positions, 0)]
+        return result if found.all() else pd.Series(result).where(found).values
+
+    isnan = np.isnan(values) if values.dtype.kind == 'f' else np.zeros(n, dtype = bool)
+    count = np.add.reduceat((~isnan).astype(np.int64), segment_starts)
+    if agg == 'count':
+        return count
+    if agg in ('min', 'max'):
+        return (np.fmin if agg == 'min' else np.fmax).reduceat(values, segment_starts)
+
+    total = np.add.reduceat(np.where(isnan, 0, values), segment_starts)
+    if agg == 'sum':
+        return total
+
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        mean = total/count
+        if agg == 'mean':
+            return mean
+        segment_ids = np.repeat(np.arange(len(segment_starts)), np.diff(np.append(segment_starts, n)))
+        deviations = np.where(isnan, 0, values - mean[segment_ids])
+        var = np.add.reduceat(deviations*deviations, segment_starts)/(count - ddof)
+    var[count - ddof <= 0] = np.nan
+    return var if agg == 'var' else np.sqrt(var)
+
+def _make_sorted_resampling_and_shift_features(
+    df, calculate_columns, group_columns, date_column, freq, agg, n_periods_shift, assert_frequency, suffix, extra_columns, **agg_kwargs
+):
+    '''
+    make_generic_resampling_and_shift_features without groupby or resample: shifted dates are turned into integer
+    period codes, rows are stably sorted once by (group code, period code) and every column is reduced over the
+    resulting contiguous segments with ufunc.reduceat. with assert_frequency, missing periods are filled by a
+    vectorized forward fill over the dense (group x period) grid.
+    returns None when freq, agg or the column dtypes are not supported, so the caller falls back to pandas
+    '''
+    if not isinstance(agg, str) or not agg in _SORTED_RESAMPLING_AGGS:
+        return None
+    if set(agg_kwargs) - ({'ddof'} if agg in ('std', 'var') else set()):
+        return None
+    if not agg in ('first', 'last') and not all(
+        pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col]) for col in calculate_columns
+    ):
+        return None
+    if len(df) == 0 or any(isinstance(df[col].dtype, pd.CategoricalDtype) for col in group_columns):
+        return None
+
+    dates = _shift_dates(df[date_column], freq, n_periods_shift).values #shift
+    periods = _get_period_codes(dates, freq)
+    if periods is None:
+        return None
+    period_codes, to_labels = periods
+
+    group_codes = _get_group_codes(df, group_columns)
+    rows = np.flatnonzero((group_codes >= 0) & ~np.isnat(dates))
+    if len(rows) == 0:
+        return None
+    order = rows[np.lexsort((period_codes[rows], group_codes[rows]))]
+    sorted_groups, sorted_periods = group_codes[order], period_codes[order]
+
+    new_segment = np.ones(len(order), dtype = bool)
+    new_segment[1:] = (np.diff(sorted_groups) != 0) | (np.diff(sorted_periods) != 0)
+    segment_starts = np.flatnonzero(new_segment)
+    segment_periods = sorted_periods[segment_starts]
+    segment_rows = order[segment_starts]
+
+    if not suffix:
+        names = [f'{i}__{str(agg)}_{str(agg_kwargs)}' for i in calculate_columns]
+    else:
+        names = [f'{i}__{suffix}' for i in calculate_columns]
+    values = [_segment_reduce(df[col].values[order], segment_starts, agg, **agg_kwargs) for col in calculate_columns]
+    values += [_segment_reduce(df[col].values[order], segment_starts, 'last') for col in extra_columns]
+
+    if assert_frequency:
+        segment_groups = sorted_groups[segment_starts]
+        is_group_start = np.ones(len(segment_starts), dtype = bool)
+        is_group_start[1:] = segment_groups[1:] != segment_groups[:-1]
+        group_first = np.flatnonzero(is_group_start)
+        group_last = np.append(group_first[1:], len(segment_starts)) - 1
+        first_period = segment_periods[group_first]
+        n_periods = segment_periods[group_last] - first_period + 1
+        grid_offsets = np.cumsum(n_periods) - n_periods
+
+        segment_group = np.cumsum(is_group_start) - 1
+        positions = grid_offsets[segment_group] + segment_periods - first_period[segment_group]
+        source = np.zeros(n_periods.sum(), dtype = np.int64)
+        source[positions] = np.arange(len(segment_starts))
+        # forward fill: empty periods take the last observed segment of the same group
+        source = np.maximum.accumulate(source)
+
+        segment_periods = np.arange(len(source)) - np.repeat(grid_offsets - first_period, n_periods)
+        segment_rows = segment_rows[source]
+        values = [v[source] for v in values]
+
+    keys = df[group_columns].iloc[segment_rows].reset_index(drop = True)
+    labels = pd.Series(to_labels(segment_periods), name = date_column)
+    features = pd.DataFrame(dict(zip([*names, *extra_columns], values)))
+
+    if assert_frequency:
+        return pd.concat([labels, keys, features], axis = 1)
+    return pd.concat([keys, labels, features], axis = 1)
+
+def _make_grouper_resampling_and_shift_features(
+    df, calculate_columns, group_columns, date_column, freq, agg, n_periods_shift, assert_frequency, suffix, extra_columns, **agg_kwargs
+):
+    '''
+    make_generic_resampling_and_shift_features through pandas: groupby + Grouper, and a second groupby + resample
+    for assert_frequency. supports every agg and freq, and is the reference of _make_sorted_resampling_and_shift_features
+    '''
+    with _stage('shift_set_index_groupby', df) as stage:
+        grouped = stage.output(
+            df
+            .assign(**{date_column:_shift_dates(df[date_column], freq, n_periods_shift)}) #shift
+            .set_index(date_column)
+            .groupby([*group_columns, pd.Grouper(freq = freq)])
+        )
+
+
+    with _stage('resample', grouped, freq = freq, agg = agg) as stage:
+        if isinstance(agg, str):
+            df = getattr(grouped[calculate_columns], agg)(**agg_kwargs)
+        else:
+            df = grouped[calculate_columns].apply(lambda x: agg(x,**agg_kwargs))
+        stage.output(df)
+
+
+    with _stage('rename_columns', df):
+        if not suffix:
+            df.columns = [f'{i}__{str(agg)}_{str(agg_kwargs)}' for i in df.columns]
+        else:
+            df.columns = [f'{i}__{suffix}' for i in df.columns]
+
+    if extra_columns:
+        # same groupby, so both results share the same index
+        with _stage('extra_columns', df) as stage:
+            df = stage.output(pd.concat([df, grouped[extra_columns].last()], axis = 1))
+
+    #create new shifted date_col
+    #df.loc[:, date_column] = date_col_values
+
+
+    if assert_frequency:
+        with _stage('assert_frequency', df, freq = freq) as stage:
+            df = df.reset_index()
+            df = stage.output(df.set_index(date_column).groupby(group_columns).resample(freq).fillna(method = 'ffill'))
+
+
+    with _stage('reset_index', df) as stage:
+        resetable_indexes = list(set(df.index.names) - set(df.columns))
+        df = df.reset_index(level = resetable_indexes)
+        df = stage.output(df.reset_index(drop = True))
+
+    return df
+
+def _make_resampling_and_shift_features(
+    df, calculate_columns, group_columns, date_column, freq, agg, n_periods_shift, assert_frequency, suffix, extra_columns, **agg_kwargs
+):
+    '''
+    make_generic_resampling_and_shift_features without compact: the sorted kernel, or the pandas path when it returns None.
+    kept out of the @_profiled function, so compact calls are recorded once
+    '''
+    with _stage('sorted_resampling', df, freq = freq, agg = agg) as stage:
+        sorted_result = stage.output(_make_sorted_resampling_and_shift_features(
+            df, calculate_columns, group_columns, date_column, freq, agg, n_periods_shift,
+            assert_frequency, suffix, extra_columns, **agg_kwargs
+        ))
+    if sorted_result is not None:
+        return sorted_result
+
+    return _make_grouper_resampling_and_shift_features(
+        df, calculate_columns, group_columns, date_column, freq, agg, n_periods_shift,
+        assert_frequency, suffix, extra_columns, **agg_kwargs
+    )
+
+@_profiled
 def make_generic_resampling_and_shift_features(
     df, calculate_columns, group_columns, date_column, freq = 'm',
-    agg = 'last', n_periods_shift = 0, assert_frequency = False, suffix = '',**agg_kwargs
+    agg = 'last', n_periods_shift = 0, assert_frequency = False, suffix = '', extra_columns = [], compact = False, **agg_kwargs
 ):
 
     '''
@@ -334,54 +1445,57 @@ def make_generic_resampling_and_shift_features(
     suffix: Str
         suffix for features names
 
+    extra_columns: list of str
+        list of extra columns to be passed to the final dataframe without aggregation (takes the last value of each period).
+        they share the groupby of calculate_columns, so no merge is needed to carry them
+
+    compact: bool or "periods", default = False
+        True returns features as float32 and object group keys as categoricals (see _compact_output), within float32
+        relative precision (2**-24) of the default output. "periods" also replaces date_column with int32 period codes
+        (ordinals of pd.Period(date, freq)) instead of timestamps
+
     agg_kwargs:
         key word arguments passed to agg
 
+    for builtin aggs (sum, mean, min, max, count, first, last, std, var) and calendar or fixed frequencies, rows are
+    sorted once by group and integer period code and reduced segment-wise, instead of going through groupby + Grouper
+    (and a second groupby + resample for assert_frequency). other cases fall back to pandas.
+
     Returns
     -------
     DataFrame with the new calculated features
     '''
 
     if calculate_columns is None:
-        calculate_columns = [i for i in df.columns if not i in [*group_columns, date_column]]
-
-    keep_columns = [*group_columns, date_column, *calculate_columns]
+        calculate_columns = [i for i in df.columns if not i in [*group_columns, date_column, *extra_columns]]
 
-    df = (
-        df
-        .assign(**{date_column:df[date_column] + pd.Timedelta(n_periods_shift,freq)}) #shift
-        .set_index(date_column)
-        .groupby([*group_columns, pd.Grouper(freq = freq)])
+    features = _make_resampling_and_shift_features(
+        df, calculate_columns, group_columns, date_column, freq, agg, n_periods_shift,
+        assert_frequency, suffix, extra_columns, **agg_kwargs
     )
+    if not compact:
+        return features
+
+    with _stage('compact', features) as stage:
+        return stage.output(_compact_output(
+            features,
+            group_columns,
+            [col for col in features.columns if not col in (*group_columns, date_column, *extra_columns)],
+            date_column = date_column,
+            freq = freq if compact == 'periods' else None
+        ))
 
 
-    if isinstance(agg, str):
-        df = getattr(df[calculate_columns], agg)(**agg_kwargs)
-    else:
-        df = df[calculate_columns].apply(lambda x: agg(x,**agg_kwargs))
-
-
-    if not suffix:
-        df.columns = [f'{i}__{str(agg)}_{str(agg_kwargs)}' for i in df.columns]
-    else:
-        df.columns = [f'{i}__{suffix}' for i in df.columns]
-
-    #create new shifted date_col
-    #df.loc[:, date_column] = date_col_values
-
-
-    if assert_frequency:
-        df = df.reset_index()
-        df = df.set_index(date_column).groupby(group_columns).resample(freq).fillna(method = 'ffill')
-
-
-    resetable_indexes = list(set(df.index.names) - set(df.columns))
-    df = df.reset_index(level = resetable_indexes)
-    df = df.reset_index(drop = True)
-
-    return df
-
+def _rolling_output_order(df, group_columns):
+    '''
+    positions of df rows in the order groupby rolling outputs them (sorted group keys, original order inside groups).
+    rolling results are row aligned with df.iloc[order], so columns can be carried through without merging
+    '''
+    codes = _get_group_codes(df, group_columns)
+    order = np.argsort(codes, kind = 'stable')
+    return order[codes[order] >= 0]
 
+@_profiled
 def create_rolling_resampled_features(
     df,
     calculate_columns,
@@ -404,7 +1518,8 @@ def create_rolling_resampled_features(
     axis=0,
     closed=None,
     rolling_operation_kwargs = {},
-    resample_agg_kwargs = {}
+    resample_agg_kwargs = {},
+    cache = None,
 ):
     '''
     calculates rolling features groupwise, than resamples according to resample period.
@@ -428,7 +1543,7 @@ def create_rolling_resampled_features(
 
     extra_columns: list of str
         list of extra columns to be passed to the final dataframe without aggregation (takes the last values, assumes they're constant along groupby).
-        usefull to pass merge keys
+        usefull to pass merge keys. columns are carried positionally alongside the rolled rows, without any merge
 
     n_periods_shift: int
         number of periods to perform the shift opeartion. shifting is important after aggregation to avoid information leakage
@@ -482,8 +1597,18 @@ def create_rolling_resampled_features(
 
     resample_agg_kwargs: dict
         key word arguments passed to resample_agg
+
+    cache: FeatureCache or str, default = None
+        opt-in disk cache (or path of its directory). results are keyed by a fingerprint of the used columns of df and
+        all other parameters, and a hit skips the whole rolling/resample pipeline, returning a memory-mapped result
     '''
 
+    if cache is not None:
+        params = {k: v for k, v in locals().items() if not k in ('df', 'cache')}
+        cache = cache if isinstance(cache, FeatureCache) else FeatureCache(cache)
+        columns = None if calculate_columns is None else list(dict.fromkeys([*group_columns, date_column, *calculate_columns, *extra_columns]))
+        return cache.cached(create_rolling_resampled_features, df, columns, **params)
+
     if rolling_first:
 
         features_df = make_generic_rolling_features(
@@ -505,13 +1630,10 @@ def create_rolling_resampled_features(
 
 
         if extra_columns:
-
-            features_df = features_df.merge(
-                df[extra_columns + group_columns + [date_column]],
-                how = 'left',
-                left_on = group_columns + [date_column],
-                right_on = group_columns + [date_column]
-            )
+            # rolling output is row aligned with df sorted by group, no need to merge
+            with _stage('extra_columns', features_df) as stage:
+                extra_df = df[extra_columns].iloc[_rolling_output_order(df, group_columns)]
+                features_df = stage.output(pd.concat([features_df, extra_df.reset_index(drop = True)], axis = 1))
 
 
         features_df = make_generic_resampling_and_shift_features(
@@ -524,6 +1646,7 @@ def create_rolling_resampled_features(
             assert_frequency = assert_frequency,
             suffix = resample_suffix,
             n_periods_shift = n_periods_shift,
+            extra_columns = extra_columns,
         )
 
     else:
@@ -538,19 +1661,13 @@ def create_rolling_resampled_features(
             assert_frequency = assert_frequency,
             suffix = resample_suffix,
             n_periods_shift = n_periods_shift,
+            extra_columns = extra_columns,
         )
 
-
-        features_df = features_df.merge(
-            df[extra_columns + group_columns + [date_column]],
-            how = 'left',
-            left_on = group_columns + [date_column],
-            right_on = group_columns + [date_column]
-        )
-
+        resampled_df = features_df
         features_df = make_generic_rolling_features(
-            features_df,
-            calculate_columns = None,
+            resampled_df,
+            calculate_columns = [i for i in resampled_df.columns if not i in [*group_columns, date_column, *extra_columns]],
             group_columns = group_columns,
             date_column = date_column,
             suffix = rolling_suffix,
@@ -565,465 +1682,279 @@ def create_rolling_resampled_features(
             **rolling_operation_kwargs
         )
 
-
+        if extra_columns:
+            with _stage('extra_columns', features_df) as stage:
+                extra_df = resampled_df[extra_columns].iloc[_rolling_output_order(resampled_df, group_columns)]
+                features_df = stage.output(pd.concat([features_df, extra_df.reset_index(drop = True)], axis = 1))
 
     return features_df
 
-
-# Cell
-from functools import reduce, partial
-import os
-import datetime as dt
-from tqdm import tqdm
-from warnings import warn
-
-import pandas as pd
-import numpy as np
-import numba
-
-from dask import dataframe as dd
-from dask import delayed
-from dask.diagnostics import ProgressBar
-
-
 # Cell
-
-def _get_index_rolling_windows(rolling_obj):
+class _WindowBoundsIndexer(pd.api.indexers.BaseIndexer):
     '''
-    get positional indexes of rows of each rolling window
+    pandas window indexer returning precomputed start and end bounds.
+    allows builtin rolling aggregations to run over all groups at once, without a groupby
     '''
 
-    if hasattr(rolling_obj, '_selection'):
-        previous_selection = getattr(rolling_obj, '_selection')
-    else:
-        previous_selection = None
-
-    INDEX_LIST = []
-    #define function to append values to global INDEX_LIST since rolling apply won't let return arrays
-    def f(x): INDEX_LIST.append(x.astype(int)); return 0
-    assert '__indexer__' not in rolling_obj.obj.columns, 'DataFrame should not contain any col with "__indexer__" name'
-    rolling_obj.obj = rolling_obj.obj.assign(__indexer__ = np.arange(len(rolling_obj.obj)), inplace = True)
-    rolling_obj._selection = '__indexer__'
-    rolling_obj.apply(f, raw = True)
-    rolling_obj.obj = rolling_obj.obj.drop(columns = ['__indexer__'])
-
-    delattr(rolling_obj, '_selection')
+    def __init__(self, start, end):
+        super().__init__(start = start, end = end)
 
-    if not previous_selection is None:
-        setattr(rolling_obj, '_selection', previous_selection)
-
-    return INDEX_LIST
-
-
-def _apply_custom_rolling(rolling_obj, func, raw = True, engine = 'numpy', *args, **kwargs):
+    def get_window_bounds(self, num_values = 0, min_periods = None, center = None, closed = None, step = None):
+        return self.start, self.end
 
-    engines = {
-        'numpy':_rolling_apply_custom_agg_numpy,
-        'pandas':_rolling_apply_custom_agg_pandas,
-        'numba':_rolling_apply_custom_agg_numpy_jit
-    }
-    _rolling_apply = engines[engine]
-
-    indexes = _get_index_rolling_windows(rolling_obj)
-    if hasattr(rolling_obj, '_selection'):
-        if getattr(rolling_obj, '_selection') is None:
-            values = _rolling_apply(rolling_obj.obj, indexes, func, *args, **kwargs)
-
-        values = _rolling_apply(rolling_obj.obj[rolling_obj._selection], indexes, func, *args, **kwargs)
-    else:
-        values = _rolling_apply(rolling_obj.obj, indexes, func, *args, **kwargs)
-
-    return values
-
-
-
-def _rolling_apply_custom_agg_numpy_jit(df, indexes, func):
-    '''
-    applies some aggregation function over groups defined by index.
-    groups are numpy arrays
-    '''
-
-    dfv = df.values
-    # template of output to create empty array
-    #use this for jit version
-    shape = np.array(func(dfv[:1])).shape
-    #d = [np.empty(*shape) for _ in  range(len(indexes))]
-    result_array = np.empty((len(indexes),*shape))
-
-    @numba.jit(forceobj=True)
-    def _roll_apply(dfv, indexes, func, result_array):
-        for i in np.arange(len(indexes)):
-            data = dfv[indexes[i]]
-            if len(data) > 0:
-                result = func(data)
-                result_array[i] = result
-            else:
-                result = np.empty(shape)
-
-
-        return result_array
-
-    return _roll_apply(dfv, indexes, func, result_array)
-
-
-def _rolling_apply_custom_agg_numpy(df, indexes, func, *args, **kwargs):
-    '''
-    applies some aggregation function over groups defined by index.
-    groups are numpy arrays
-    '''
-
-    dfv = df.values
-    d = [[] for _ in range(len(indexes))]
-    for i in tqdm(range(len(indexes))):
-        data = dfv[indexes[i]]
-        if len(data) > 0:
-            result = func(data, *args, **kwargs)
-            d[i] = result
-
-    return d
-
-def _rolling_apply_custom_agg_pandas(df, indexes, func, *args, **kwargs):
-    '''
-    applies some aggregation function over groups defined by index.
-    groups are pandas dataframes
-    '''
-
-    # template of output to create empty array
-    d = [[] for _ in range(len(indexes))]
-
-    for i in tqdm(range(len(indexes))):
-        data = df.iloc[indexes[i]]
-        if len(data) > 0:
-            result = func(data, *args, **kwargs)
-            d[i] = result
-
-    return pd.concat(d)
-
-# Cell
-def _make_rolling_groupby_object(df, group_columns, date_column):
-    '''
-    helping function to make computational graph creation faster
-    '''
-    groupby_object = df.set_index(date_column).groupby(group_columns)
-
-    return groupby_object
-
-def make_generic_rolling_features(
+@_profiled
+def make_multi_rolling_features(
     df,
     calculate_columns,
     group_columns,
     date_column,
+    rolling_spec,
     suffix = None,
-    rolling_operation = 'mean',
-    window = '60D',
-    min_periods=None,
-    center=False,
-    win_type=None,
-    on=None,
-    axis=0,
-    closed=None,
-    **rolling_operation_kwargs
+    min_periods = None,
+    center = False,
+    closed = None,
+    assume_sorted = False,
 ):
     '''
-    make generic/custom rolling opeartion for a given column, grouped by customer, having Data de Emissao as date index
-    if calculate cols is None, than use all cols
+    make several rolling operations, over several windows, in a single pass.
+    rows are grouped and sorted only once, window bounds are computed once per window and shared
+    among all its operations, and all features are returned in a single wide DataFrame, with the same rows and
+    values of calling make_generic_rolling_features for each (window, rolling_operation) pair.
+    without suffix, features are named as make_generic_rolling_features names them. with a suffix, names also keep
+    the operation, {col}__rolling_{rolling_operation}_{window}_{suffix}, so operations of a window don't collide
 
     Parameters
     ----------
 
     df: DataFrame
-        DataFrame to make rolling features over
+        pandas DataFrame to make rolling features over
 
     calculate_columns: list of str
-        list of columns to perform rolling_operation over
+        list of columns to perform rolling operations over
 
     group_columns: list of str
-        list of columns passed to GroupBy operator prior to rolling
+        list of columns to group by prior to rolling
 
     date_column: str
         datetime column to roll over
 
+    rolling_spec: dict
+        maps each window to a list of rolling operations, e.g. {'7D': ['mean','max'], '30D': ['sum','std'], 10: ['median']}.
+        an operation can also be a (rolling_operation, rolling_operation_kwargs) tuple, such as ('quantile', {'quantile': 0.9})
+
     suffix: Str
         suffix for features names
 
-    rolling_operation: Str of aggregation function, deafult = "mean"
-        str representing groupby object method, such as mean, var, quantile ...
-
-    window:
-        DataFrameGroupBy.Rolling parameter. please refer to documentation
-
     min_periods:
         DataFrameGroupBy.Rolling parameter. please refer to documentation
 
     center:
         DataFrameGroupBy.Rolling parameter. please refer to documentation
 
-    win_type:
-        DataFrameGroupBy.Rolling parameter. please refer to documentation
-
-    on:
-        DataFrameGroupBy.Rolling parameter. please refer to documentation
-
-    axis:
-        DataFrameGroupBy.Rolling parameter. please refer to documentation
-
     closed:
         DataFrameGroupBy.Rolling parameter. please refer to documentation
 
-    rolling_operation_kwargs:
-        key word arguments passed to rolling_operation
+    assume_sorted: bool, default = False
+        df is already sorted by (group_columns, date_column). checked in O(n), then grouping and sorting are skipped
+        (see make_generic_rolling_features)
 
     Returns
     -------
-    DataFrame with the new calculated features
+    DataFrame with group_columns, date_column and the new calculated features
     '''
 
     assert group_columns.__class__ in (set, tuple, list), 'group_columns type should be one of (tuple, list, set), not {group_columns.__class__}'
-    if calculate_columns is None:
-        calculate_columns = [i for i in df.columns if not i in [*group_columns, date_column]]
-
-    keep_columns = [*group_columns, date_column, *calculate_columns]
 
-    if not isinstance(df,(
-        dd.groupby.DataFrameGroupBy,
-        pd.core.groupby.generic.DataFrameGroupBy,
-        pd.core.groupby.generic.SeriesGroupBy,
-        dd.groupby.SeriesGroupBy
-    )):
+    return _multi_rolling_features(
+        df, calculate_columns, group_columns, date_column, rolling_spec,
+        suffix = suffix, min_periods = min_periods, center = center, closed = closed, assume_sorted = assume_sorted
+    )[1]
 
-        df = _make_rolling_groupby_object(df, group_columns, date_column)
-
-    if isinstance(df, (pd.core.groupby.generic.DataFrameGroupBy, pd.core.groupby.generic.SeriesGroupBy)):
-
-
-        df = getattr(
-            df[calculate_columns]
-            .rolling(
-                window = window,
-                min_periods=min_periods,
-                center=center,
-                win_type=win_type,
-                on=on,
-                axis=axis,
-                closed=closed
-            ),
-            rolling_operation,
-
-        )(**rolling_operation_kwargs).reset_index()
-
-    else: #syntax for dask groupby rolling
-
-        df = df[calculate_columns].apply(
-                lambda x: getattr(
-                    x.sort_index().rolling(
-                        window = window,
-                        min_periods=min_periods,
-                        center=center,
-                        win_type=win_type,
-                        on=on,
-                        axis=axis,
-                        closed=closed
-                    ),
-                    rolling_operation,
-                )(**rolling_operation_kwargs).reset_index()
-            #meta = meta, #works only for float rolling
-
-            ).reset_index().drop(columns = [f'level_{len(group_columns)}']) #drop unwanted "level_n" cols
-
-
-    if not suffix:
-
-        df.columns = [
-            f'{col}__rolling_{rolling_operation}_{window}_{str(rolling_operation_kwargs)}'
-            if not col in (*group_columns, date_column) else col
-            for col in df.columns
-        ]
-    else:
-        df.columns = [
-            f'{col}__rolling_{window}_{suffix}'
-            if not col in (*group_columns, date_column) else col
-            for col in df.columns
-        ]
-
-    return df
-
-def _make_shift_resample_groupby_object(df, group_columns, date_column,freq, n_periods_shift):
-
-    groupby_object = (
-            df
-            .assign(**{date_column:df[date_column] + pd.Timedelta(n_periods_shift,freq)}) #shift
-            .set_index(date_column)
-            .groupby([*group_columns, pd.Grouper(freq = freq)])
-        )
-    return groupby_object
-
-def make_generic_resampling_and_shift_features(
-    df, calculate_columns, group_columns, date_column, freq = 'm',
-    agg = 'last', n_periods_shift = 0, assert_frequency = False, suffix = '',**agg_kwargs
+def _multi_rolling_features(
+    df, calculate_columns, group_columns, date_column, rolling_spec,
+    suffix = None, min_periods = None, center = False, closed = None, assume_sorted = False
 ):
-
     '''
-    makes generic resamples (aggregates by time frequency) on column.
-    shifts one period up to avoid information leakage.
-    Doing this through this function, although imposing some limitations to resampling periods, is much more efficient than
-    pandas datetime-set_index + groupby + resampling.
-
-    Parameters
-    ----------
-
-    df: DataFrame
-        DataFrame to make rolling features over
-
-    calculate_columns: list of str
-        list of columns to perform rolling_operation over
-
-    group_columns: list of str
-        list of columns passed to GroupBy operator prior to rolling
-
-    date_column: str
-        datetime column to roll over
-
-    freq: valid pandas freq str:
-        frequency to resample data
-
-    agg: Str of aggregation function, deafult = "last"
-        str representing groupby object method, such as mean, var, last ...
-
-    n_periods_shift: int
-        number of periods to perform the shift opeartion. shifting is important after aggregation to avoid information leakage
-        e.g. assuming you have the information of the end of the month in the beggining of the month.
-
-    assert_frequency: bool, default = False
-        resamples data to match freq, using foward fill method for
-        missing values
-
-    suffix: Str
-        suffix for features names
-
-    agg_kwargs:
-        key word arguments passed to agg
-
-    Returns
-    -------
-    DataFrame with the new calculated features
+    implementation of make_multi_rolling_features.
+    returns (order, features), such that rows of features correspond to df.iloc[order]
     '''
-
+    group_columns = list(group_columns)
     if calculate_columns is None:
         calculate_columns = [i for i in df.columns if not i in [*group_columns, date_column]]
 
-    keep_columns = [*group_columns, date_column, *calculate_columns]
-
-    df = (
-        df
-        .assign(**{date_column:df[date_column] + pd.Timedelta(n_periods_shift,freq)}) #shift
-        .set_index(date_column)
-        .groupby([*group_columns, pd.Grouper(freq = freq)])
-    )
+    with _stage('sort', df) as stage:
+        group_starts = _get_presorted_group_starts(df, group_columns, date_column) if assume_sorted else None
+        if assume_sorted and group_starts is None:
+            raise ValueError('df is not sorted by (group_columns, date_column) or has null group keys, use assume_sorted = False')
+        if group_starts is None:
+            codes = _get_group_codes(df, group_columns)
+            order = _get_sorted_order(codes, df[date_column].values)
+            group_starts = _get_group_starts(codes[order])
+        else:
+            order = np.arange(len(df))
+        dates = df[date_column].values[order]
+        values = stage.output(df[calculate_columns].iloc[order].reset_index(drop = True))
+
+    features = [
+        df[[*group_columns, date_column]].iloc[order].reset_index(drop = True),
+        *_rolling_spec_features(values, dates, group_starts, rolling_spec, suffix, min_periods, center, closed)
+    ]
+    with _stage('concat', values) as stage:
+        return order, stage.output(pd.concat(features, axis = 1))
+
+def _rolling_spec_features(values, dates, group_starts, rolling_spec, suffix = None, min_periods = None, center = False, closed = None):
+    '''
+    list of feature DataFrames of every (window, rolling_operation) of rolling_spec, over values and dates
+    sorted by group and date (groups beginning at group_starts)
+    '''
+    features = []
+    for window, rolling_operations in rolling_spec.items():
+        with _stage('window_bounds', values, window = window):
+            start, end = _get_window_bounds(dates, group_starts, window, closed = closed, center = center, min_periods = 0)
+        for rolling_operation in rolling_operations:
+            if isinstance(rolling_operation, str):
+                rolling_operation, rolling_operation_kwargs = rolling_operation, {}
+            else:
+                rolling_operation, rolling_operation_kwargs = rolling_operation
 
+            # bounds are shared by all operations of a window, min_periods defaults depend on the operation
+            rolling = values.rolling(
+                _WindowBoundsIndexer(start = start, end = end),
+                min_periods = _default_min_periods(window, min_periods, rolling_operation)
+            )
 
-    if isinstance(agg, str):
-        df = getattr(df[calculate_columns], agg)(**agg_kwargs)
-    else:
-        df = df[calculate_columns].apply(lambda x: agg(x,**agg_kwargs))
+            with _stage('rolling', values, rolling_operation = rolling_operation, window = window) as stage:
+                feature = stage.output(getattr(rolling, rolling_operation)(**rolling_operation_kwargs))
+            feature.columns = [
+                _multi_rolling_feature_name(col, rolling_operation, window, suffix, rolling_operation_kwargs)
+                for col in feature.columns
+            ]
+            features.append(feature)
 
+    return features
 
+def _multi_rolling_feature_name(col, rolling_operation, window, suffix, rolling_operation_kwargs):
+    '''
+    name of a make_multi_rolling_features feature of col
+    '''
     if not suffix:
-        df.columns = [f'{i}__{str(agg)}_{str(agg_kwargs)}' for i in df.columns]
+        return f'{col}__rolling_{rolling_operation}_{window}_{str(rolling_operation_kwargs)}'
     else:
-        df.columns = [f'{i}__{suffix}' for i in df.columns]
-
-    #create new shifted date_col
-    #df.loc[:, date_column] = date_col_values
-
+        return f'{col}__rolling_{rolling_operation}_{window}_{suffix}'
 
-    if assert_frequency:
-        df = df.reset_index()
-        df = df.set_index(date_column).groupby(group_columns).resample(freq).fillna(method = 'ffill')
-
-
-    resetable_indexes = list(set(df.index.names) - set(df.columns))
-    df = df.reset_index(level = resetable_indexes)
-    df = df.reset_index(drop = True)
+# Cell
+@lazy_njit(parallel = True, nogil = True)
+def _merge_sorted_runs(keys, ties, run_bounds, segment_runs):
+    '''
+    permutation sorting rows by (keys, ties) inside each segment made of consecutive sorted runs.
+    run i is rows run_bounds[i]:run_bounds[i + 1] and segment s is made of runs segment_runs[s]:segment_runs[s + 1].
+    runs of each segment are merged pairwise, bottom-up, in O(n log(runs per segment)), segments in parallel
+    '''
+    order = np.arange(len(keys))
+    buffer = np.empty(len(keys), dtype = np.int64)
+    for s in _numba.prange(len(segment_runs) - 1):
+        first = segment_runs[s]
+        last = segment_runs[s + 1]
+        src = order
+        dst = buffer
+        in_buffer = False
+        width = 1
+        while width < last - first:
+            for left in range(first, last, 2*width):
+                a = run_bounds[left]
+                b = run_bounds[min(left + width, last)]
+                c = run_bounds[min(left + 2*width, last)]
+                i = a
+                j = b
+                for k in range(a, c):
+                    if j >= c or (i < b and (
+                        keys[src[i]] < keys[src[j]] or (keys[src[i]] == keys[src[j]] and ties[src[i]] <= ties[src[j]])
+                    )):
+                        dst[k] = src[i]
+                        i += 1
+                    else:
+                        dst[k] = src[j]
+                        j += 1
+            src, dst = dst, src
+            in_buffer = not in_buffer
+            width *= 2
+
+        if in_buffer:
+            order[run_bounds[first]:run_bounds[last]] = buffer[run_bounds[first]:run_bounds[last]]
+
+    return order
+
+def _merged_level_order(df, level, finer_order, finer_starts, dates):
+    '''
+    (order, group_starts) of df grouped by level and sorted by date, from rows already sorted by a finer grouping
+    (df.iloc[finer_order], groups beginning at finer_starts, dates sorted inside each of them), whose groups must be
+    unions of the finer ones. finer groups (runs) are stably sorted by level, which only costs one row per run, moved
+    next to each other, and the runs of each group of level are merged
+    '''
+    n_rows, n_runs = len(finer_order), len(finer_starts)
+    # one row per finer group is enough to group level
+    codes = df[level].iloc[finer_order[finer_starts]].groupby(level, sort = True, dropna = False).ngroup().values
+    run_order = np.argsort(codes, kind = 'stable')
+    run_lengths = np.diff(np.append(finer_starts, n_rows))[run_order]
+    run_starts = np.cumsum(run_lengths) - run_lengths
+    segments = _get_group_starts(codes[run_order])
+    if (run_order == np.arange(n_runs)).all():
+        order = finer_order
+    else:
+        rows = np.arange(n_rows) + np.repeat(finer_starts[run_order] - run_starts, run_lengths)
+        order, dates = finer_order[rows], dates[rows]
 
-    return df
+    if len(segments) == n_runs:
+        return order, run_starts
 
+    run_bounds = np.append(run_starts, n_rows).astype(np.int64)
+    segment_runs = np.append(segments, n_runs).astype(np.int64)
+    # ties in date keep the order of df, as when sorting level from scratch
+    merged = _merge_sorted_runs(_as_int64(dates), order.astype(np.int64), run_bounds, segment_runs)
+    return order[merged], run_starts[segments]
 
-def create_rolling_resampled_features(
+@_profiled
+def make_hierarchical_rolling_features(
     df,
     calculate_columns,
-    group_columns,
+    group_levels,
     date_column,
-    extra_columns = [],
-    n_periods_shift = 1,
-    rolling_first = True,
-    rolling_operation = 'mean',
-    window = '60D',
-    resample_freq = 'm',
-    resample_agg = 'last',
-    assert_frequency = False,
-    rolling_suffix = '',
-    resample_suffix = '',
-    min_periods=None,
-    center=False,
-    win_type=None,
-    on=None,
-    axis=0,
-    closed=None,
-    rolling_operation_kwargs = {},
-    resample_agg_kwargs = {}
+    rolling_spec,
+    suffix = None,
+    min_periods = None,
+    center = False,
+    closed = None,
 ):
     '''
-    calculates rolling features groupwise, than resamples according to resample period.
-    calculations can be done the other way arround if rolling_first is set to False
+    make_multi_rolling_features at several grouping levels, e.g. customer + product, customer and region,
+    sorting rows only once. rows are sorted by the finest key (the columns of all levels) and date, so the groups of
+    every level are unions of key groups, each one a run of rows sorted by date. the windows of each level are then
+    derived by bringing its runs together and merging them, in O(n log(runs per group)), instead of regrouping and
+    sorting all rows again. levels are processed from the finest to the coarsest, and a level nesting inside an already
+    processed one (customer inside customer + product, or region inside customer when each customer belongs to a
+    single region) merges the fewer, longer runs of that one instead. it pays off the most when levels share a prefix
+    or nest inside each other
 
     Parameters
     ----------
 
-
     df: DataFrame
-        DataFrame to make rolling features over
+        pandas DataFrame to make rolling features over
 
     calculate_columns: list of str
-        list of columns to perform rolling_operation over
+        list of columns to perform rolling operations over
 
-    group_columns: list of str
-        list of columns passed to GroupBy operator prior to rolling
+    group_levels: list of lists of str
+        group_columns of each level, e.g. [['customer', 'product'], ['customer'], ['region']]
 
     date_column: str
         datetime column to roll over
 
-    extra_columns: list of str
-        list of extra columns to be passed to the final dataframe without aggregation (takes the last values, assumes they're constant along groupby).
-        usefull to pass merge keys
+    rolling_spec: dict
+        maps each window to a list of rolling operations (see make_multi_rolling_features), computed at every level
 
-    n_periods_shift: int
-        number of periods to perform the shift opeartion. shifting is important after aggregation to avoid information leakage
-        e.g. assuming you have the information of the end of the month in the beggining of the month.
-
-    rolling_first: bool, deafult = True
-        whether to perform rolling before resampling, or the other way arround
-
-    rolling_operation: Str of aggregation function, deafult = "mean"
-        str representing groupby object method, such as mean, var, quantile ...
-
-    window:
-        DataFrameGroupBy.Rolling parameter. please refer to documentation
-
-    resample_freq: valid pandas freq str:
-        frequency to resample data
-
-    resample_agg: Str of aggregation function, deafult = "last"
-        str representing groupby object method, such as mean, var, last ...
-
-    assert_frequency: bool, default = False
-        resamples data to match freq, using foward fill method for
-        missing values
-
-    rolling_suffix: Str
-        suffix for the rolling part of features names
-
-    resample_suffix: Str
-        suffix for the resample part of features names
+    suffix: Str
+        suffix for features names
 
     min_periods:
         DataFrameGroupBy.Rolling parameter. please refer to documentation
@@ -1031,106 +1962,242 @@ def create_rolling_resampled_features(
     center:
         DataFrameGroupBy.Rolling parameter. please refer to documentation
 
-    win_type:
-        DataFrameGroupBy.Rolling parameter. please refer to documentation
-
-    on:
-        DataFrameGroupBy.Rolling parameter. please refer to documentation
-
-    axis:
-        DataFrameGroupBy.Rolling parameter. please refer to documentation
-
     closed:
         DataFrameGroupBy.Rolling parameter. please refer to documentation
 
-    rolling_operation_kwargs: dict
-        key word arguments passed to rolling_operation
-
-    resample_agg_kwargs: dict
-        key word arguments passed to resample_agg
+    Returns
+    -------
+    DataFrame with the index of df, the group columns of all levels, date_column and the features of every level,
+    named as in make_multi_rolling_features followed by "__by_" and the level columns.
+    rows with null keys at a level have null features at that level
     '''
 
-    if rolling_first:
-
-        features_df = make_generic_rolling_features(
-            df,
-            calculate_columns = calculate_columns,
-            group_columns = group_columns,
-            date_column = date_column,
-            suffix = rolling_suffix,
-            rolling_operation = rolling_operation,
-            window = window,
-            min_periods=min_periods,
-            center=center,
-            win_type=win_type,
-            on=on,
-            axis=axis,
-            closed=closed,
-            **rolling_operation_kwargs
+    levels = [list(level) for level in group_levels]
+    assert levels and all(level for level in levels), 'group_levels should be a non empty list of non empty lists of columns'
+    if calculate_columns is None:
+        calculate_columns = [i for i in df.columns if not i in [*{col for level in levels for col in level}, date_column]]
+
+    # columns of levels with less columns first, so that they tend to be prefixes of the key
+    key = []
+    for level in sorted(levels, key = len):
+        key += [col for col in level if not col in key]
+
+    with _stage('sort', df, key = key) as stage:
+        codes = df.groupby(key, sort = True, dropna = False).ngroup().values
+        key_order = stage.output(_get_sorted_order(codes, df[date_column].values))
+        key_starts = _get_group_starts(codes[key_order])
+        # one row per key group is enough to count groups of every level, and tell which levels nest in others
+        key_rows = df[key].iloc[key_order[key_starts]]
+        n_groups = [key_rows.groupby(level, dropna = False).ngroups for level in levels]
+
+    def _nests(level, finer):
+        return set(level) <= set(levels[finer]) or (
+            key_rows.groupby(list(dict.fromkeys([*levels[finer], *level])), dropna = False).ngroups == n_groups[finer]
         )
 
-
-        if extra_columns:
-
-            features_df = features_df.merge(
-                df[extra_columns + group_columns + [date_column]],
-                how = 'left',
-                left_on = group_columns + [date_column],
-                right_on = group_columns + [date_column]
+    level_features = {}
+    merged = [] # (level, order, group_starts) of levels processed so far, from the finest to the coarsest
+    for i in sorted(range(len(levels)), key = lambda i: -n_groups[i]):
+        level = levels[i]
+        # the coarsest level processed so far whose groups are unions of finer ones, or the key
+        finer_order, finer_starts = next(
+            ((order, group_starts) for finer, order, group_starts in reversed(merged) if _nests(level, finer)),
+            (key_order, key_starts)
+        )
+        with _stage('merge_runs', df, level = level):
+            order, group_starts = _merged_level_order(
+                df, level, finer_order, finer_starts, df[date_column].values[finer_order]
             )
+        merged.append((i, order, group_starts))
 
-
-        features_df = make_generic_resampling_and_shift_features(
-            features_df,
-            calculate_columns = None,
-            date_column = date_column,
-            group_columns = group_columns,
-            freq = resample_freq,
-            agg = resample_agg,
-            assert_frequency = assert_frequency,
-            suffix = resample_suffix,
-            n_periods_shift = n_periods_shift,
+        values = df[calculate_columns].iloc[order].reset_index(drop = True)
+        features = pd.concat(
+            _rolling_spec_features(
+                values, df[date_column].values[order], group_starts, rolling_spec, suffix, min_periods, center, closed
+            ),
+            axis = 1
         )
 
-    else:
+        # back to the rows of df
+        with _stage('scatter', features, level = level) as stage:
+            level_values = np.full((len(df), features.shape[1]), np.nan)
+            level_values[order] = features.values
+            level_values[df[level].isna().any(axis = 1).values] = np.nan
+            level_features[i] = stage.output(pd.DataFrame(
+                level_values,
+                index = df.index,
+                columns = [f'{col}__by_{"_".join(level)}' for col in features.columns]
+            ))
+
+    features = [df[[*key, date_column]], *(level_features[i] for i in range(len(levels)))]
+    with _stage('concat', df) as stage:
+        return stage.output(pd.concat(features, axis = 1))
 
-        features_df = make_generic_resampling_and_shift_features(
-            df,
-            calculate_columns = calculate_columns,
-            date_column = date_column,
-            group_columns = group_columns,
-            freq = resample_freq,
-            agg = resample_agg,
-            assert_frequency = assert_frequency,
-            suffix = resample_suffix,
-            n_periods_shift = n_periods_shift,
+# Cell
+def _rolling_shard_worker(shared, dtypes, n_rows, n_columns, shard_start, shard_end, rolling_kwargs):
+    '''
+    computes groupby rolling over rows shard_start:shard_end of the arrays in shared memory
+    (group codes, dates and values, sorted by group), writing results into the shared output array
+    '''
+    blocks = {k: shared_memory.SharedMemory(name = name) for k, name in shared.items()}
+    try:
+        arrays = {
+            k: np.ndarray((n_rows, n_columns) if k in ('values', 'out') else (n_rows,), dtype = dtypes[k], buffer = blocks[k].buf)
+            for k in blocks
+        }
+        shard = pd.DataFrame(
+            arrays['values'][shard_start:shard_end].copy(),
+            index = pd.Index(arrays['dates'][shard_start:shard_end].copy(), name = '__date__')
         )
-
-
-        features_df = features_df.merge(
-            df[extra_columns + group_columns + [date_column]],
-            how = 'left',
-            left_on = group_columns + [date_column],
-            right_on = group_columns + [date_column]
+        codes = arrays['codes'][shard_start:shard_end].copy()
+        rolling_operation = rolling_kwargs.pop('rolling_operation')
+        rolling_operation_kwargs = rolling_kwargs.pop('rolling_operation_kwargs')
+        result = getattr(shard.groupby(codes).rolling(**rolling_kwargs), rolling_operation)(**rolling_operation_kwargs)
+        arrays['out'][shard_start:shard_end] = result.values
+        del arrays
+    finally:
+        for block in blocks.values():
+            block.close()
+
+    return shard_end - shard_start
+
+def _process_pool_context():
+    '''
+    multiprocessing context of the shard pool. forking is not safe once numba's parallel threading layer
+    is running (e.g. after backend = "native"), so workers are started from a forkserver then
+    '''
+    if not 'numba' in sys.modules:
+        return None # numba was never used
+    try:
+        _numba.threading_layer()
+    except ValueError:
+        return None # threading layer not initialized, default context
+
+    return multiprocessing.get_context('forkserver')
+
+def _make_parallel_rolling_features(
+    df, calculate_columns, group_columns, date_column, n_jobs, suffix = None, rolling_operation = 'mean',
+    window = '60D', min_periods = None, center = False, win_type = None, closed = None, **rolling_operation_kwargs
+):
+    '''
+    multiprocess make_generic_rolling_features for pandas DataFrames.
+    rows are sorted by group (keeping their order inside groups, as groupby rolling does), and split into shards of
+    whole groups with similar number of rows.
+    group codes, dates and values are copied once into shared memory, so workers don't unpickle DataFrames,
+    and each worker writes its results straight into a shared output array, already in the final row order
+    '''
+    group_columns = list(group_columns)
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+
+    codes = _get_group_codes(df, group_columns)
+    order = np.argsort(codes, kind = 'stable')
+    order = order[codes[order] >= 0] # null group keys are dropped by groupby
+    n_rows, n_columns = len(order), len(calculate_columns)
+
+    inputs = {
+        'codes': codes[order],
+        'dates': df[date_column].values[order],
+        'values': df[calculate_columns].values[order].astype(np.float64),
+    }
+    dtypes = {k: v.dtype for k, v in inputs.items()}
+    dtypes['out'] = np.dtype(np.float64)
+
+    # shards of whole groups, with about the same number of rows
+    group_starts = _get_group_starts(inputs['codes'])
+    cuts = np.append(group_starts, n_rows)[np.searchsorted(group_starts, np.linspace(0, n_rows, 4*n_jobs + 1)[1:-1])]
+    cuts = np.unique([0, *cuts, n_rows])
+
+    blocks = {}
+    try:
+        for k in ('codes', 'dates', 'values', 'out'):
+            nbytes = n_rows*(n_columns if k in ('values', 'out') else 1)*dtypes[k].itemsize
+            blocks[k] = shared_memory.SharedMemory(create = True, size = max(nbytes, 1))
+        for k, v in inputs.items():
+            np.ndarray(v.shape, dtype = v.dtype, buffer = blocks[k].buf)[:] = v
+        del inputs
+
+        rolling_kwargs = dict(
+            window = window, min_periods = min_periods, center = center, win_type = win_type, closed = closed,
+            rolling_operation = rolling_operation, rolling_operation_kwargs = rolling_operation_kwargs
         )
+        shared = {k: block.name for k, block in blocks.items()}
+        with ProcessPoolExecutor(max_workers = n_jobs, mp_context = _process_pool_context()) as executor:
+            futures = [
+                executor.submit(_rolling_shard_worker, shared, dtypes, n_rows, n_columns, a, b, dict(rolling_kwargs))
+                for a, b in zip(cuts[:-1], cuts[1:])
+            ]
+            with _progress('parallel rolling shards', len(futures)) as progress:
+                for future in futures:
+                    future.result()
+                    progress.update()
+
+        values = np.ndarray((n_rows, n_columns), dtype = np.float64, buffer = blocks['out'].buf).copy()
+    finally:
+        for block in blocks.values():
+            block.close()
+            block.unlink()
+
+    return _make_sorted_features_frame(
+        df, order, group_columns, date_column, values,
+        [_rolling_feature_name(col, rolling_operation, window, suffix, rolling_operation_kwargs) for col in calculate_columns]
+    )
 
-        features_df = make_generic_rolling_features(
-            features_df,
-            calculate_columns = None,
-            group_columns = group_columns,
-            date_column = date_column,
-            suffix = rolling_suffix,
-            rolling_operation = rolling_operation,
-            window = window,
-            min_periods=min_periods,
-            center=center,
-            win_type=win_type,
-            on=on,
-            axis=axis,
-            closed=closed,
-            **rolling_operation_kwargs
-        )
+def _make_sorted_features_frame(df, order, group_columns, date_column, values, feature_names):
+    '''
+    output frame of rolling features computed over df.iloc[order]: group columns, date column and features
+    '''
+    features = pd.DataFrame(values, columns = feature_names)
+    keys = df[[*group_columns, date_column]].iloc[order].reset_index(drop = True)
+    return pd.concat([keys, features], axis = 1)
 
 
+# Cell
+_NATIVE_ROLLING_OPERATIONS = ('mean', 'sum', 'std', 'var', 'min', 'max', 'count', 'median', 'quantile')
 
-    return features_df
+def _make_native_rolling_features(
+    df, calculate_columns, group_columns, date_column, suffix = None, rolling_operation = 'mean',
+    window = '60D', min_periods = None, center = False, closed = None, group_starts = None, **rolling_operation_kwargs
+):
+    '''
+    make_generic_rolling_features computed by the numba kernels of the online engine, straight over numpy arrays.
+    rows are sorted by group once (keeping their order inside groups), window bounds are found in a single vectorized pass, and all
+    calculate_columns are reduced together as a 2d block, in parallel over groups (numba prange, without the GIL).
+    no pandas Rolling object is built, so cost doesn't grow with the number of groups.
+    passing group_starts means df is already sorted by group and date (see _get_presorted_group_starts), and skips sorting.
+    '''
+    if not rolling_operation in _NATIVE_ROLLING_OPERATIONS:
+        raise ValueError(f'backend = "native" supports only {_NATIVE_ROLLING_OPERATIONS}, not {rolling_operation}')
+    if rolling_operation_kwargs.get('interpolation', 'linear') != 'linear':
+        raise ValueError('backend = "native" supports only linear quantile interpolation')
+
+    group_columns = list(group_columns)
+    if group_starts is None:
+        # rows keep their order inside groups, as in groupby rolling
+        codes = _get_group_codes(df, group_columns)
+        order = np.argsort(codes, kind = 'stable')
+        order = order[codes[order] >= 0] # null group keys are dropped by groupby
+        group_starts = _get_group_starts(codes[order])
+    else:
+        order = np.arange(len(df))
+    dates = df[date_column].values[order]
+    if not isinstance(window, (int, np.integer)):
+        same_group = np.ones(max(len(order) - 1, 0), dtype = bool)
+        same_group[group_starts[1:] - 1] = False
+        if (same_group & (_as_int64(dates[1:]) < _as_int64(dates[:-1]))).any():
+            raise ValueError(f'{date_column} must be sorted inside each group for time windows, as in pandas rolling')
+    start, end = _get_window_bounds(dates, group_starts, window, closed = closed, center = center, min_periods = 0)
+
+    values = _rolling_apply_custom_agg_online(
+        pd.DataFrame(df[calculate_columns].values[order]),
+        start,
+        end,
+        rolling_operation,
+        min_periods = _default_min_periods(window, min_periods, rolling_operation),
+        group_starts = group_starts,
+        **{k:v for k,v in rolling_operation_kwargs.items() if k != 'interpolation'}
+    )
+
+    return _make_sorted_features_frame(
+        df, order, group_columns, date_column, values,
+        [_rolling_feature_name(col, rolling_operation, window, suffix, rolling_operation_kwargs) for col in calculate_columns]
+    )
@@ -0,0 +1,582 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: notebooks_dev/streaming.ipynb (unless otherwise specified).
+
+__all__ = ['iter_rolling_features', 'make_streaming_rolling_features', 'read_arrow', 'make_arrow_rolling_features',
+           'update_rolling_features', 'update_resampling_and_shift_features']
+
+# Cell
+import os
+
+import pandas as pd
+import numpy as np
+
+from .lazy import lazy_import
+
+_pa = lazy_import('pyarrow')
+_pq = lazy_import('pyarrow.parquet')
+_ds = lazy_import('pyarrow.dataset')
+
+from .rolling import (
+    make_generic_rolling_features, make_generic_resampling_and_shift_features,
+    _multi_rolling_features, _rolling_output_order, _window_to_int64,
+    _WindowBoundsIndexer, _multi_rolling_feature_name, _get_group_codes, _get_sorted_order,
+    _get_group_starts, _get_window_bounds, _default_min_periods, _shift_dates
+)
+
+
+# Cell
+def _group_keys(df, group_columns):
+    '''
+    hashable group keys of each row, as an Index
+    '''
+    if len(group_columns) == 1:
+        return pd.Index(df[group_columns[0]])
+
+    return pd.MultiIndex.from_frame(df[group_columns])
+
+def _get_window_tail(df, group_columns, date_column, rolling_spec):
+    '''
+    rows of df (sorted by date inside each group) that can still belong to the windows of future rows of the same group:
+    rows inside the longest time window of their group's last date, and the last rows of each group for fixed (int) windows
+    '''
+    time_windows = [_window_to_int64(w) for w in rolling_spec if not isinstance(w, (int, np.integer))]
+    row_windows = [w for w in rolling_spec if isinstance(w, (int, np.integer))]
+
+    keep = np.zeros(len(df), dtype = bool)
+    if time_windows:
+        dates = df[date_column]
+        last_dates = dates.groupby([df[c] for c in group_columns], sort = False).transform('max')
+        keep |= (dates >= last_dates - pd.Timedelta(max(time_windows), 'ns')).values
+    if row_windows:
+        # one extra row covers closed = "left" / "both"
+        position_from_end = df.groupby(group_columns, sort = False).cumcount(ascending = False).values
+        keep |= position_from_end < max(row_windows) + 1
+
+    return df[keep]
+
+def _check_chunk_order(tail, chunk, group_columns, date_column):
+    '''
+    asserts rows of every group arrive in date order, i.e. the chunk holds no row older than the tail of its group
+    '''
+    if not len(tail):
+        return
+
+    last_dates = tail.groupby(group_columns)[date_column].max()
+    first_dates = chunk.groupby(group_columns)[date_column].min()
+    last_dates, first_dates = last_dates.align(first_dates, join = 'inner')
+    if (first_dates < last_dates).any():
+        raise ValueError('chunks should arrive in date order inside each group')
+
+def iter_rolling_features(
+    chunks,
+    calculate_columns,
+    group_columns,
+    date_column,
+    rolling_spec,
+    suffix = None,
+    min_periods = None,
+    closed = None,
+):
+    '''
+    computes rolling features over an iterator of DataFrames, holding in memory only the current chunk
+    and a tail buffer with the rows of each group that can still fall inside a window.
+    tail rows are prepended to the next chunk, so results at chunk edges are exactly the same as computing over the whole data.
+
+    rows of each group should arrive in date order (e.g. a dataset partitioned by date, or by group and sorted by date).
+
+    Parameters
+    ----------
+
+    chunks: iterable of DataFrame
+        chunks of data to make rolling features over
+
+    calculate_columns: list of str
+        list of columns to perform rolling operations over
+
+    group_columns: list of str
+        list of columns to group by prior to rolling
+
+    date_column: str
+        datetime column to roll over
+
+    rolling_spec: dict
+        maps each window to a list of rolling operations. please refer to make_multi_rolling_features
+
+    suffix: Str
+        suffix for features names
+
+    min_periods:
+        DataFrameGroupBy.Rolling parameter. please refer to documentation
+
+    closed:
+        DataFrameGroupBy.Rolling parameter. please refer to documentation
+
+    Yields
+    -------
+    DataFrame with the features of the rows of each chunk, sorted by group and date inside the chunk
+    '''
+
+    group_columns = list(group_columns)
+    keep_columns = [*group_columns, date_column, *calculate_columns]
+    tail = None
+
+    for chunk in chunks:
+
+        chunk = chunk[keep_columns]
+        if not len(chunk):
+            continue
+
+        if tail is None:
+            data, n_tail = chunk, 0
+        else:
+            _check_chunk_order(tail, chunk, group_columns, date_column)
+            # tails of groups missing from this chunk are kept aside, untouched
+            in_chunk = _group_keys(tail, group_columns).isin(_group_keys(chunk, group_columns))
+            idle_tail = tail[~in_chunk]
+            data = pd.concat([tail[in_chunk], chunk], ignore_index = True)
+            n_tail = in_chunk.sum()
+
+        order, features = _multi_rolling_features(
+            data, calculate_columns, group_columns, date_column, rolling_spec,
+            suffix = suffix, min_periods = min_periods, closed = closed
+        )
+        yield features[order >= n_tail].reset_index(drop = True)
+
+        sorted_data = data.iloc[order]
+        if tail is not None:
+            sorted_data = pd.concat([idle_tail, sorted_data], ignore_index = True)
+
+        tail = _get_window_tail(sorted_data, group_columns, date_column, rolling_spec).reset_index(drop = True)
+
+
+# Cell
+def _iter_parquet_chunks(path, columns, chunk_size):
+    '''
+    reads a parquet file or dataset (hive partitioned directory) in chunks of at most chunk_size rows,
+    following the order of its files and row groups
+    '''
+    dataset = _ds.dataset(path, format = 'parquet', partitioning = 'hive')
+    for fragment in dataset.get_fragments():
+        for batch in fragment.to_batches(columns = columns, batch_size = chunk_size):
+            yield batch.to_pandas()
+
+def make_streaming_rolling_features(
+    source,
+    output_path,
+    calculate_columns,
+    group_columns,
+    date_column,
+    rolling_spec,
+    suffix = None,
+    min_periods = None,
+    closed = None,
+    chunk_size = 1_000_000,
+):
+    '''
+    out of core version of make_multi_rolling_features.
+    reads source in chunks, computes rolling features exactly (see iter_rolling_features) and appends
+    them to a parquet file as they are computed, so peak memory is bounded by chunk size plus window size,
+    not by dataset size.
+
+    Parameters
+    ----------
+
+    source: str or iterable of DataFrame
+        path to a parquet file or dataset directory, or an iterator of DataFrames.
+        rows of each group should arrive in date order
+
+    output_path: str
+        path of the parquet file features are written to
+
+    calculate_columns: list of str
+        list of columns to perform rolling operations over
+
+    group_columns: list of str
+        list of columns to group by prior to rolling
+
+    date_column: str
+        datetime column to roll over
+
+    rolling_spec: dict
+        maps each window to a list of rolling operations. please refer to make_multi_rolling_features
+
+    suffix: Str
+        suffix for features names
+
+    min_periods:
+        DataFrameGroupBy.Rolling parameter. please refer to documentation
+
+    closed:
+        DataFrameGroupBy.Rolling parameter. please refer to documentation
+
+    chunk_size: int
+        maximum number of rows read at once, when source is a parquet path
+
+    Returns
+    -------
+    output_path
+    '''
+
+    if isinstance(source, (str, os.PathLike)):
+        source = _iter_parquet_chunks(source, [*group_columns, date_column, *calculate_columns], chunk_size)
+
+    writer = None
+    try:
+        for features in iter_rolling_features(
+            source, calculate_columns, group_columns, date_column, rolling_spec,
+            suffix = suffix, min_periods = min_periods, closed = closed
+        ):
+            table = _pa.Table.from_pandas(features, preserve_index = False)
+            if writer is None:
+                writer = _pq.ParquetWriter(output_path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return output_path
+
+
+# Cell
+def read_arrow(path):
+    '''
+    memory-mapped pyarrow Table of an (uncompressed) Arrow IPC / Feather v2 file.
+    buffers are paged in from disk on access, so opening the file costs no memory
+    '''
+    return _pa.ipc.open_file(_pa.memory_map(path)).read_all()
+
+def _column_view(table, column):
+    '''
+    numpy array of a table column. zero-copy view over the Arrow buffer when the column is
+    a single chunk of fixed width values without nulls, a copy (nulls as NaN/NaT) otherwise
+    '''
+    column = table.column(column)
+    array = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+    return array.to_numpy(zero_copy_only = False)
+
+def _batch_window_bounds(start, end, batch_start, batch_end):
+    '''
+    (first, last, indexer): windows of rows batch_start:batch_end span rows first:last (bounds are monotonic),
+    and indexer gives their bounds relative to first, with empty windows for the other rows of first:last
+    '''
+    start, end = start[batch_start:batch_end], end[batch_start:batch_end]
+    first, last = min(start[0], batch_start), max(end[-1], batch_end)
+    before = np.zeros(batch_start - first, dtype = np.int64)
+    after = np.full(last - batch_end, last - first, dtype = np.int64)
+    return first, last, _WindowBoundsIndexer(
+        start = np.concatenate([before, start - first, after]), end = np.concatenate([before, end - first, after])
+    )
+
+def make_arrow_rolling_features(
+    source,
+    output_path,
+    calculate_columns,
+    group_columns,
+    date_column,
+    rolling_spec,
+    suffix = None,
+    min_periods = None,
+    center = False,
+    closed = None,
+    batch_size = 1_000_000,
+):
+    '''
+    Arrow native version of make_multi_rolling_features, for data that barely fits (or doesn't fit) in memory.
+    source is memory-mapped and only group keys, sort order and window bounds are held in memory for all rows.
+    features are computed one record batch at a time, over the rows of the batch and the ones their windows reach,
+    and written straight to an Arrow IPC file, so feature memory is bounded by batch_size.
+    when source is already sorted by group and date, rows are read through zero-copy views of its columns
+    (single chunk columns without nulls, see _column_view); otherwise the rows of each batch are gathered in sorted order
+
+    Parameters
+    ----------
+
+    source: str or pyarrow.Table
+        path to an uncompressed Arrow IPC / Feather v2 file (see read_arrow), or a Table
+
+    output_path: str
+        path of the Arrow IPC file features are written to
+
+    calculate_columns: list of str
+        list of columns to perform rolling operations over
+
+    group_columns: list of str
+        list of columns to group by prior to rolling
+
+    date_column: str
+        datetime column to roll over
+
+    rolling_spec: dict
+        maps each window to a list of rolling operations. please refer to make_multi_rolling_features
+
+    suffix: Str
+        suffix for features names
+
+    min_periods:
+        DataFrameGroupBy.Rolling parameter. please refer to documentation
+
+    center:
+        DataFrameGroupBy.Rolling parameter. please refer to documentation
+
+    closed:
+        DataFrameGroupBy.Rolling parameter. please refer to documentation
+
+    batch_size: int
+        number of rows of each record batch written to output_path (and computed at once)
+
+    Returns
+    -------
+    memory-mapped pyarrow Table of output_path, with the same columns and rows as make_multi_rolling_features
+    '''
+
+    table = read_arrow(source) if isinstance(source, (str, os.PathLike)) else source
+    group_columns = list(group_columns)
+
+    codes = _get_group_codes(table.select(group_columns).to_pandas(), group_columns)
+    order = _get_sorted_order(codes, _column_view(table, date_column))
+    group_starts = _get_group_starts(codes[order])
+    del codes
+    # already sorted sources (e.g. written by a previous run) are read through views, without gathering rows
+    presorted = np.array_equal(order, np.arange(table.num_rows))
+    dates = _column_view(table, date_column)
+    bounds = {
+        window: _get_window_bounds(
+            dates if presorted else dates[order], group_starts, window, closed = closed, center = center, min_periods = 0
+        )
+        for window in rolling_spec
+    }
+    del dates
+
+    keys = table.select([*group_columns, date_column])
+    if not presorted:
+        keys = keys.take(_pa.array(order))
+
+    spec = {
+        window: [
+            (rolling_operation, {}) if isinstance(rolling_operation, str) else rolling_operation
+            for rolling_operation in rolling_operations
+        ]
+        for window, rolling_operations in rolling_spec.items()
+    }
+    # same column order as make_multi_rolling_features: window, operation, column
+    names = [
+        _multi_rolling_feature_name(col, rolling_operation, window, suffix, rolling_operation_kwargs)
+        for window, rolling_operations in spec.items()
+        for rolling_operation, rolling_operation_kwargs in rolling_operations
+        for col in calculate_columns
+    ]
+    schema = _pa.schema([*keys.schema, *(_pa.field(name, _pa.float64()) for name in names)])
+    columns = {col: _column_view(table, col) for col in calculate_columns}
+    with _pa.OSFile(output_path, 'wb') as sink:
+        with _pa.ipc.new_file(sink, schema) as writer:
+            for batch_start in range(0, len(order), batch_size):
+                batch_end = min(batch_start + batch_size, len(order))
+                features = {}
+                for window, rolling_operations in spec.items():
+                    first, last, indexer = _batch_window_bounds(*bounds[window], batch_start, batch_end)
+                    rows = slice(first, last) if presorted else order[first:last]
+                    for col in calculate_columns:
+                        values = pd.Series(columns[col][rows])
+                        for rolling_operation, rolling_operation_kwargs in rolling_operations:
+                            rolling = values.rolling(
+                                indexer, min_periods = _default_min_periods(window, min_periods, rolling_operation)
+                            )
+                            name = _multi_rolling_feature_name(col, rolling_operation, window, suffix, rolling_operation_kwargs)
+                            feature = getattr(rolling, rolling_operation)(**rolling_operation_kwargs).values
+                            features[name] = feature[batch_start - first:batch_end - first]
+
+                batch_keys = keys.slice(batch_start, batch_end - batch_start)
+                writer.write_batch(_pa.RecordBatch.from_arrays(
+                    [*(column.combine_chunks() for column in batch_keys.columns), *(_pa.array(features[name]) for name in names)],
+                    schema = schema
+                ))
+
+    return read_arrow(output_path)
+
+
+# Cell
+def _split_state(state, new_df, group_columns, date_column):
+    '''
+    splits state rows into the ones of groups present in new_df (to be recomputed along with it) and idle ones
+    '''
+    if state is None or not len(state):
+        return new_df.iloc[:0], new_df.iloc[:0]
+
+    _check_chunk_order(state, new_df, group_columns, date_column)
+    in_new = _group_keys(state, group_columns).isin(_group_keys(new_df, group_columns))
+    return state[in_new], state[~in_new]
+
+def _sort_by_group(df, group_columns, date_column):
+    '''
+    stable sort by group keys and date, the row order of full (non incremental) feature computations
+    '''
+    return df.sort_values([*group_columns, date_column], kind = 'mergesort').reset_index(drop = True)
+
+def update_rolling_features(
+    new_df,
+    state,
+    calculate_columns,
+    group_columns,
+    date_column,
+    suffix = None,
+    rolling_operation = 'mean',
+    window = '60D',
+    min_periods = None,
+    win_type = None,
+    closed = None,
+    previous_features = None,
+    **rolling_operation_kwargs
+):
+    '''
+    incremental (append only) version of make_generic_rolling_features.
+    only the rows in new_df, plus the state (rows of each group that can still fall inside a window), are processed,
+    and results are identical to recomputing over the whole history.
+
+    Parameters
+    ----------
+
+    new_df: DataFrame
+        new rows. rows of each group should not be older than the ones already processed
+
+    state: DataFrame or None
+        state returned by the previous call, None on the first call.
+        it is a plain DataFrame, that can be persisted with DataFrame.to_parquet
+
+    calculate_columns, group_columns, date_column, suffix, rolling_operation, window, min_periods, win_type, closed:
+        make_generic_rolling_features parameters. please refer to its documentation
+
+    previous_features: DataFrame or None
+        previously computed features. if passed, new features are appended to them,
+        in the same row order as make_generic_rolling_features over the whole history
+
+    rolling_operation_kwargs:
+        key word arguments passed to rolling_operation
+
+    Returns
+    -------
+    (features, state): features of new rows (or all features, if previous_features is passed) and the new state
+    '''
+
+    group_columns = list(group_columns)
+    if calculate_columns is None:
+        calculate_columns = [i for i in new_df.columns if not i in [*group_columns, date_column]]
+
+    new_df = new_df[[*group_columns, date_column, *calculate_columns]]
+    active_state, idle_state = _split_state(state, new_df, group_columns, date_column)
+    data = pd.concat([active_state, new_df], ignore_index = True)
+
+    features = make_generic_rolling_features(
+        data,
+        calculate_columns = calculate_columns,
+        group_columns = group_columns,
+        date_column = date_column,
+        suffix = suffix,
+        rolling_operation = rolling_operation,
+        window = window,
+        min_periods = min_periods,
+        win_type = win_type,
+        closed = closed,
+        **rolling_operation_kwargs
+    )
+    order = _rolling_output_order(data, group_columns)
+    features = features[order >= len(active_state)].reset_index(drop = True)
+
+    sorted_data = pd.concat([idle_state, data.iloc[order]], ignore_index = True)
+    state = _get_window_tail(sorted_data, group_columns, date_column, [window]).reset_index(drop = True)
+
+    if previous_features is not None:
+        features = _sort_by_group(pd.concat([previous_features, features], ignore_index = True), group_columns, date_column)
+
+    return features, state
+
+def update_resampling_and_shift_features(
+    new_df,
+    state,
+    calculate_columns,
+    group_columns,
+    date_column,
+    freq = 'm',
+    agg = 'last',
+    n_periods_shift = 0,
+    assert_frequency = False,
+    suffix = '',
+    extra_columns = [],
+    previous_features = None,
+    **agg_kwargs
+):
+    '''
+    incremental (append only) version of make_generic_resampling_and_shift_features.
+    state holds the rows of the last (still open) period of each group, which are aggregated again along with new_df,
+    so results are identical to recomputing over the whole history. freq should be a calendar frequency
+    (e.g. "D", "W", "m"), since bins of multiples such as "7D" depend on the first date of data.
+
+    Parameters
+    ----------
+
+    new_df: DataFrame
+        new rows. rows of each group should not be older than the ones already processed
+
+    state: DataFrame or None
+        state returned by the previous call, None on the first call.
+        it is a plain DataFrame, that can be persisted with DataFrame.to_parquet
+
+    calculate_columns, group_columns, date_column, freq, agg, n_periods_shift, assert_frequency, suffix, extra_columns:
+        make_generic_resampling_and_shift_features parameters. please refer to its documentation
+
+    previous_features: DataFrame or None
+        previously computed features. if passed, periods recomputed are replaced and new ones are appended,
+        in the same row order as make_generic_resampling_and_shift_features over the whole history
+
+    agg_kwargs:
+        key word arguments passed to agg
+
+    Returns
+    -------
+    (features, state): features of recomputed and new periods (or all features, if previous_features is passed)
+    and the new state
+    '''
+
+    group_columns = list(group_columns)
+    if calculate_columns is None:
+        calculate_columns = [i for i in new_df.columns if not i in [*group_columns, date_column, *extra_columns]]
+
+    new_df = new_df[[*group_columns, date_column, *calculate_columns, *extra_columns]]
+    active_state, idle_state = _split_state(state, new_df, group_columns, date_column)
+    data = pd.concat([active_state, new_df], ignore_index = True)
+
+    features = make_generic_resampling_and_shift_features(
+        data,
+        calculate_columns = calculate_columns,
+        group_columns = group_columns,
+        date_column = date_column,
+        freq = freq,
+        agg = agg,
+        n_periods_shift = n_periods_shift,
+        assert_frequency = assert_frequency,
+        suffix = suffix,
+        extra_columns = extra_columns,
+        **agg_kwargs
+    )
+
+    # new state: rows in the last period of each group, binned exactly as the resampling does
+    periods = (
+        data
+        .assign(**{date_column:_shift_dates(data[date_column], freq, n_periods_shift)})
+        .set_index(date_column)
+        .groupby([*group_columns, pd.Grouper(freq = freq)])
+        .ngroup()
+        .values
+    )
+    last_periods = pd.Series(periods).groupby([data[c] for c in group_columns], sort = False).transform('max').values
+    state = pd.concat([idle_state, data[periods == last_periods]], ignore_index = True)
+
+    if previous_features is not None:
+        # replace periods that were recomputed
+        first_dates = features.groupby(group_columns)[date_column].min()
+        position = first_dates.index.get_indexer(_group_keys(previous_features, group_columns))
+        recomputed = (position >= 0) & (previous_features[date_column].values >= first_dates.values[position])
+        features = _sort_by_group(
+            pd.concat([previous_features[~recomputed], features], ignore_index = True),
+            group_columns, date_column
+        )
+
+    return features, state